@@ -11,7 +11,78 @@ __author__ = 'Devonte'
 __copyright__ = 'MIT'
 __version__ = '0.0.5a'
 
-from .api import Dashactyl
-from .managers import CoinsManager, DashUserManager, ResourceManager, \
-    CouponManager, DashUserServerManager
-from .structures import DashUser, DashServer, Coupon
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# submodules are imported on first access, so scripts only pay for what they use
+_exports = {
+    'Dashactyl': 'api',
+    'DashactylCluster': 'cluster',
+    'HashRing': 'cluster',
+    'Cache': 'cache',
+    'CachePolicy': 'cache',
+    'JSONCodec': 'codec',
+    'StdlibCodec': 'codec',
+    'OrjsonCodec': 'codec',
+    'Histogram': 'metrics',
+    'Metrics': 'metrics',
+    'RateLimiter': 'ratelimit',
+    'RetryPolicy': 'retry',
+    'CircuitBreaker': 'retry',
+    'CircuitOpenError': 'retry',
+    'SQLiteStore': 'store',
+    'SyncEngine': 'sync',
+    'Transport': 'transport',
+    'HTTPTransport': 'transport',
+    'HTTP2Transport': 'transport',
+    'LocalTransport': 'transport',
+    'AsyncTransport': 'transport',
+    'AsyncHTTPTransport': 'transport',
+    'AsyncHTTP2Transport': 'transport',
+    'AsyncLocalTransport': 'transport',
+    'CoinBuffer': 'managers',
+    'CoinsManager': 'managers',
+    'DashUserManager': 'managers',
+    'ResourceManager': 'managers',
+    'CouponManager': 'managers',
+    'DashUserServerManager': 'managers',
+    'QuotaExceededError': 'managers',
+    'DashUser': 'structures',
+    'DashServer': 'structures',
+    'Coupon': 'structures',
+    'AsyncDashactyl': 'aio',
+    'AsyncDashactylCluster': 'aio'
+}
+
+__all__ = tuple(_exports)
+
+def __getattr__(name: str):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_exports))
+
+
+if TYPE_CHECKING:
+    from .api import Dashactyl
+    from .cluster import DashactylCluster, HashRing
+    from .cache import Cache, CachePolicy
+    from .codec import JSONCodec, StdlibCodec, OrjsonCodec
+    from .metrics import Histogram, Metrics
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+    from .store import SQLiteStore
+    from .sync import SyncEngine
+    from .transport import Transport, HTTPTransport, HTTP2Transport, LocalTransport, \
+        AsyncTransport, AsyncHTTPTransport, AsyncHTTP2Transport, AsyncLocalTransport
+    from .managers import CoinBuffer, CoinsManager, DashUserManager, ResourceManager, \
+        CouponManager, DashUserServerManager, QuotaExceededError
+    from .structures import DashUser, DashServer, Coupon
+    from .aio import AsyncDashactyl, AsyncDashactylCluster
@@ -0,0 +1,759 @@
+import asyncio
+from time import monotonic
+from typing import Union, Optional, List, Iterable, AsyncIterator, Tuple
+from .api import Dashactyl, _conditional_headers, _validators
+from .cluster import DashactylCluster
+from .managers import CoinBuffer, CoinsManager, DashUserManager, DashServerManager, \
+    CouponManager, DashUserServerManager, DashUserWarning, _check_specs, _server_request, _SERVER_SPEC
+from .retry import CircuitOpenError
+from .stream import JSONArrayStream
+from .sync import SyncEngine
+from .transport import AsyncTransport, AsyncHTTPTransport, AsyncHTTP2Transport
+from .structures import DashUser, DashServer, Coupon
+
+
+__all__ = (
+    'AsyncDashactyl',
+    'AsyncDashactylCluster',
+    'AsyncCoinBuffer',
+    'AsyncSyncEngine',
+    'AsyncCoinsManager',
+    'AsyncDashServerManager',
+    'AsyncCouponManager',
+    'AsyncDashUserManager',
+    'AsyncDashUserServerManager'
+)
+
+class AsyncCoinBuffer(CoinBuffer):
+    '''Merges coin changes per user and sends them on an interval of the running event loop.
+    Nothing is flushed at exit, so `await close()` (or the client's) before the loop stops.'''
+    def __init__(self, client, interval: Optional[float]=1.0):
+        super().__init__(client, interval)
+        self._flushing = asyncio.Lock()
+    
+    def _start(self):
+        if self.interval is None or self._worker is not None:
+            return
+        
+        try:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            pass
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # shielded so closing mid-flush lets the in-flight changes settle
+            await asyncio.shield(self.flush())
+    
+    async def flush(self) -> List[Tuple[Union[int, DashUser], Union[dict, Exception]]]:
+        '''Sends every user's pending change concurrently. Returns a list of `(user, failure)` pairs for the
+        changes that failed, where the failure is the failed response or the raised exception.
+        '''
+        async with self._flushing:
+            batch = self._take()
+            results = await asyncio.gather(*(self.client.request(*self._request(coins, pending))
+                                            for coins, pending in batch),
+                                            return_exceptions=True)
+            failures = (self._settle(coins, pending, res) for (coins, pending), res in zip(batch, results))
+            return [f for f in failures if f is not None]
+    
+    async def close(self) -> list:
+        '''Stops the flush interval and flushes what is left. Returns the failures like `flush()`.'''
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        
+        return await self.flush()
+
+
+class AsyncSyncEngine(SyncEngine):
+    def __init__(self, client, budget: float=2.0, interval: float=30.0, max_interval: float=None):
+        super().__init__(client, budget, interval, max_interval)
+        self._wake = asyncio.Event()
+    
+    def _start(self):
+        if self._worker is not None or self._stopped.is_set():
+            return
+        
+        try:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            pass
+    
+    async def _poll(self, key: str):
+        users = self.client.users
+        user = users.cache.peek(key)
+        if user is None:
+            return
+        
+        try:
+            self._synced(user, *await self.client.conditional(users._path(users._key(user)),
+                                                            users.cache.validators(key)))
+        except Exception:
+            self.failures += 1
+        finally:
+            self._reschedule(key)
+    
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            key, delay = self._pop()
+            if key is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await self._poll(key)
+    
+    async def sync(self, user: DashUser):
+        '''`user` - The cached user to poll
+        
+        Polls a user straight away, outside of the schedule and the budget.
+        '''
+        with self._lock:
+            self._due.pop(user.uuid, None)
+        
+        await self._poll(user.uuid)
+    
+    def close(self):
+        '''Stops polling. Users stay cached as they were last synced.'''
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+
+class AsyncCoinsManager(CoinsManager):
+    async def add(self, amount: int) -> int:
+        '''`amount` - The number of coins to add
+        
+        Adds an amount of coins to the user's account. Returns the added coins on success.
+        '''
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'add', amount)
+        
+        amount, req = self._add(amount)
+        res = await self.client.request(*req)
+        if res['status'] != 'success':
+            raise Exception(res)
+        
+        self.amount = amount
+        return self.amount
+    
+    async def remove(self, amount: int) -> int:
+        '''`amount` - The number of coins to remove
+        
+        Removes an amount of coins from the user's account. Returns the removed coins on success.
+        '''
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'remove', amount)
+        
+        amount, req = self._remove(amount)
+        res = await self.client.request(*req)
+        if res['status'] != 'success':
+            return res
+        
+        self.amount = amount
+        return self.amount
+    
+    async def set(self, amount: int) -> int:
+        '''`amount` - The number of coins to set
+        
+        Sets the users coins to the specified amount. Returns the set amount of coins on success.
+        '''
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'set', amount)
+        
+        amount, req = self._set(amount)
+        res = await self.client.request(*req)
+        if res['status'] != 'success':
+            return res
+        
+        self.amount = amount
+        return self.amount
+
+
+class AsyncDashUserServerManager(DashUserServerManager):
+    async def create(self,
+                    name: str,
+                    ram: float,
+                    disk: float,
+                    cpu: float,
+                    egg: str,
+                    location: str) -> DashServer:
+        '''`name` - The name of the server
+        
+        `ram` - The amoout of RAM for the server
+        
+        `disk` - The amount of disk for the server
+        
+        `cpu` - The amount of CPU for the server
+        
+        `egg` - The egg for the server
+        
+        `location` - The location of the server
+        
+        Creates a new Pterodactyl server with the specified parameters.
+        Raises `QuotaExceededError` without sending a request if the user's resources would not cover it.
+        '''
+        _check_specs(ram, disk, cpu)
+        self.client.servers._check_quota(self.user, (ram, disk, cpu, 1))
+        data = await self.client.request(*_server_request(self.user, name, ram, disk, cpu, egg, location))
+        if data['status'] != 'success':
+            return data
+        
+        return self._add(data)
+    
+    async def delete(self, id: str):
+        '''`id` - The identifier or UUID of the server
+        
+        Deletes an existing server. Returns `None` on success.
+        '''
+        s = self.get(id)
+        if isinstance(s, DashServer):
+            return await s.delete()
+        
+        res = await self.client.request('GET', f'/delete?id={id}')
+        if res['status'] != 'success':
+            return res
+        
+        return None
+
+
+class AsyncDashServerManager(DashServerManager):
+    async def _modify(self, server: DashServer, ram: float, disk: float, cpu: float):
+        self._check_modify(server, ram, disk, cpu)
+        res = await self.client.request('GET', self._modify_path(server, ram, disk, cpu))
+        return self._modified(server, ram, disk, cpu, res)
+    
+    async def _delete(self, server: DashServer):
+        return self._deleted(server, await self.client.request('DELETE', self._delete_path(server)))
+    
+    async def create_many(self,
+                        specs: Iterable[dict],
+                        concurrency: int=8) -> List[Tuple[dict, Union[DashServer, dict, Exception]]]:
+        '''`specs` - Dicts of the `user` (a user or user ID), `name`, `ram`, `disk`, `cpu`, `egg` and `location` of each server
+        
+        `concurrency` - The maximum number of requests in flight (defaults to 8)
+        
+        Creates many servers concurrently. All specs are checked before any request is sent.
+        Returns `(spec, server)` pairs in the order of the specs; on failure the server is the
+        failed response or the raised exception, and the rest of the batch carries on.
+        Servers that would take a cached user past their resources get a `QuotaExceededError` and are never sent.
+        '''
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
+        
+        specs = self._check_batch(specs)
+        refused = self._plan(specs)
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def provision(spec: dict, error: Optional[Exception]):
+            if error is not None:
+                return spec, error
+            
+            async with sem:
+                try:
+                    req = _server_request(*(spec[k] for k in _SERVER_SPEC))
+                    return spec, self._provisioned(spec, await self.client.request(*req))
+                except Exception as e:
+                    return spec, e
+        
+        return list(await asyncio.gather(*(provision(s, e) for s, e in zip(specs, refused))))
+
+
+class AsyncCouponManager(CouponManager):
+    def _revalidate(self, coupon: Coupon):
+        async def run():
+            try:
+                await self.fetch(coupon.code)
+            finally:
+                self.cache.revalidated(coupon.code)
+        
+        self.client._background(run)
+    
+    async def _fetch(self, code: str) -> Optional[Coupon]:
+        cached, validators = self._validators(code)
+        return self._revalidated(cached, *await self.client.conditional(self._path(code), validators))
+    
+    async def fetch(self, code: str=None) -> Optional[Union[Coupon, List[Coupon]]]:
+        if code is None:
+            return self._resolve(await self.client.request('GET', self._path()))
+        
+        if not self.client.coalesce_reads:
+            return await self._fetch(code)
+        
+        return await self.client._coalesce(('coupons', code), self._fetch, code)
+    
+    async def get(self, code: str) -> Optional[Coupon]:
+        return self.cache.lookup(code) or await self.fetch(code)
+    
+    async def iter_coupons(self, cache: bool=False) -> AsyncIterator[Coupon]:
+        '''`cache` - Whether the coupons should be added to the cache (defaults to `False`)
+        
+        Fetches all coupons, yielding them as the response is parsed instead of loading it at once.
+        '''
+        parser = JSONArrayStream('coupons')
+        async for chunk in self.client._stream(self._path()):
+            for c in self._streamed(parser.feed(chunk), cache):
+                yield c
+        
+        for c in self._streamed(parser.close(), cache):
+            yield c
+        
+        self._check_streamed(parser)
+    
+    async def create(self,
+                    code: str=None,
+                    coins: int=0,
+                    ram: float=0,
+                    disk: float=0,
+                    cpu: float=0,
+                    servers: int=0) -> Coupon:
+        '''`code` - The name of the code
+        
+        `coins` - The number of coins the coupon should grant
+        
+        `ram` - The amoout of RAM the coupon should grant
+        
+        `disk` - The amount of disk the coupon should grant
+        
+        `cpu` - The amount of CPU the coupon should grant
+        
+        `servers` - The number of servers the coupon should grant
+        
+        Creates a new coupon with the specified parameters.
+        '''
+        data = await self.client.request(*self._create(code, coins, ram, disk, cpu, servers))
+        if data['status'] != 'success':
+            return data
+        
+        return self._add(data)
+    
+    async def revoke(self, code: str):
+        '''`code` - The code of the coupon to revoke
+        
+        Revokes a specified coupon. Returns `None` on success.
+        '''
+        self.cache.pop(code, None)
+        self.client._forget('coupons', code)
+        
+        res = await self.client.request('DELETE', f'/api/revokecoupon/{code}')
+        if res['status'] != 'success':
+            return res
+        
+        return None
+
+
+class AsyncDashUserManager(DashUserManager):
+    def _revalidate(self, user: DashUser):
+        async def run():
+            try:
+                await self.fetch(self._key(user))
+            finally:
+                self.cache.revalidated(user.uuid)
+        
+        self.client._background(run)
+    
+    async def _fetch(self, id: int) -> Optional[DashUser]:
+        cached, validators = self._validators(id)
+        return self._revalidated(cached, *await self.client.conditional(self._path(id), validators))
+    
+    async def fetch(self, id: int) -> Optional[DashUser]:
+        '''`id` - The ID of the user
+        
+        Fetches a user from the API directly. A cached user is revalidated with a conditional request.
+        Concurrent fetches of the same user share one request and return the same user.
+        '''
+        if not self.client.coalesce_reads:
+            return await self._fetch(id)
+        
+        return await self.client._coalesce(('users', str(id)), self._fetch, id)
+    
+    async def get(self, id: Union[int, str]) -> Optional[DashUser]:
+        '''`id` - The ID of the user
+        
+        Gets a user from the cache, or fetches directly if unavailable.
+        '''
+        return self._cached(id) or await self.fetch(id)
+    
+    async def fetch_many(self,
+                        ids: Iterable[int],
+                        concurrency: int=8) -> AsyncIterator[Tuple[int, Union[DashUser, dict, Exception]]]:
+        '''`ids` - The IDs of the users
+        
+        `concurrency` - The maximum number of requests in flight (defaults to 8)
+        
+        Fetches many users concurrently, skipping users that are already cached.
+        Yields `(id, user)` pairs as they complete; on failure the user is the failed
+        response or the raised exception, and the rest of the batch carries on.
+        '''
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
+        
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def fetch(id: int):
+            async with sem:
+                try:
+                    return id, await self.fetch(id)
+                except Exception as e:
+                    return id, e
+        
+        tasks = []
+        for id in dict.fromkeys(ids):
+            u = self.cache.lookup(id)
+            if u is not None:
+                yield id, u
+            else:
+                tasks.append(asyncio.ensure_future(fetch(id)))
+        
+        try:
+            for t in asyncio.as_completed(tasks):
+                yield await t
+        finally:
+            for t in tasks:
+                t.cancel()
+    
+    async def remove(self, user: Union[int, str, DashUser]):
+        '''`id` - The ID of the user
+        
+        Removes (or deletes) the specified user's account. Returns `None` on success.
+        '''
+        if not isinstance(user, DashUser):
+            user = await self.get(user)
+            if not isinstance(user, DashUser):
+                raise DashUserWarning('user not found')
+        
+        return self._drop(user, await self.client.request('DELETE', f'/api/removeaccount/{str(user.id)}'))
+
+
+class AsyncDashactyl(Dashactyl):
+    '''# Dashactyl.py
+    ### An asyncio API wrapper for Dashactyl in Python.
+    
+    Requires `aiohttp` unless another transport is given. Every method that talks to the API is awaitable.
+    '''
+    _users_cls = AsyncDashUserManager
+    _servers_cls = AsyncDashServerManager
+    _coupons_cls = AsyncCouponManager
+    _coins_cls = AsyncCoinsManager
+    _user_servers_cls = AsyncDashUserServerManager
+    _coin_buffer_cls = AsyncCoinBuffer
+    _sync_cls = AsyncSyncEngine
+    
+    def _connect(self, pool_connections: int, pool_maxsize: int, keep_alive: bool, http2: bool) -> AsyncTransport:
+        if http2:
+            return AsyncHTTP2Transport(pool_maxsize)
+        
+        return AsyncHTTPTransport(pool_connections * pool_maxsize, pool_maxsize, keep_alive)
+    
+    _writer = None
+    _revalidations = None
+    
+    def _background(self, call, *args):
+        # stale entries are revalidated a few at a time, however many of them are looked up at once
+        if self._revalidations is None:
+            self._revalidations = asyncio.Semaphore(self.max_revalidations)
+        
+        async def run():
+            async with self._revalidations:
+                await call(*args)
+        
+        asyncio.ensure_future(run())
+    
+    def _write(self, fn, *args):
+        # store writes block on the database file, so they are made in order on one thread off the event loop;
+        # the store is only a warm start, so a failed write costs a colder start rather than a request
+        if self._writer is None:
+            from concurrent.futures import ThreadPoolExecutor
+            
+            self._writer = ThreadPoolExecutor(max_workers=1)
+        
+        self._writer.submit(fn, *args)
+    
+    async def request(self, method: str, path: str, params: dict={}) -> dict:
+        '''### Not for public use.
+        
+        `method` - The HTTP method for the request
+        
+        `path` - The path to request
+        
+        `params` - Optional additional parameters for the request
+        
+        Performs an API request to the path then returns a dict response.
+        Concurrent identical GET requests share one call and the same response dict.
+        '''
+        data = self._prepare(method, params)
+        if method != 'GET' or not self.coalesce_reads:
+            return await self._send(method, path, data)
+        
+        return await self._coalesce(path, self._send, method, path, data)
+    
+    async def conditional(self, path: str, validators: tuple=None) -> tuple:
+        '''### Not for public use.
+        
+        `path` - The path to request
+        
+        `validators` - The `(etag, last_modified)` pair of the cached response, if any
+        
+        Performs a GET request that the panel may answer with 304 if the cached response is unchanged.
+        Returns the dict response, or `None` if unchanged, and the validators of the response.
+        '''
+        if not self.coalesce_reads:
+            return await self._revalidate(path, validators)
+        
+        return await self._coalesce((path, validators), self._revalidate, path, validators)
+    
+    async def _coalesce(self, key, call, *args):
+        flight = self._flights.get(key)
+        if flight is not None:
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # the task that owned the call was cancelled, so make the call again
+                return await self._coalesce(key, call, *args)
+        
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            res = await call(*args)
+            flight.set_result(res)
+            return res
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            # mark the exception as retrieved when nobody else was waiting on it
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+    
+    async def _exchange(self, method: str, path: str, data: bytes, stream: bool, headers: dict) -> tuple:
+        headers = self.headers if headers is None else {**self.headers, **headers}
+        res = await self.transport.send(method, self.domain + path, data, headers, stream)
+        if stream and res.ok:
+            return res, None, 0
+        
+        if res.status == 304:
+            return res, None, 0
+        
+        if res.ok:
+            if res.status == 204:
+                return res, {'status': 'success'}, 0
+            
+            return res, self.codec.loads(res.content), len(res.content)
+        
+        return res, self._failed(res.status, res.reason), 0
+    
+    async def _read(self, method: str, path: str, data: bytes, stream: bool, headers: dict) -> tuple:
+        metrics = self.metrics
+        sent = len(data) if data else 0
+        metrics._before(method, path)
+        start = monotonic()
+        try:
+            res, body, size = await self._exchange(method, path, data, stream, headers)
+        except BaseException:
+            metrics._after(method, path, None, monotonic() - start, sent, 0)
+            raise
+        
+        metrics._after(method, path, res.status, monotonic() - start, sent, size)
+        return res, body
+    
+    async def _attempt(self,
+                        method: str,
+                        path: str,
+                        data: bytes,
+                        stream: bool,
+                        headers: dict=None) -> tuple:
+        limiter = self.rate_limiter
+        if limiter is None:
+            return await self._read(method, path, data, stream, headers)
+        
+        for attempt in range(limiter.retries + 1):
+            await limiter.acquire_async()
+            start = monotonic()
+            try:
+                res, body = await self._read(method, path, data, stream, headers)
+            except BaseException:
+                limiter.release(None, {}, monotonic() - start)
+                raise
+            
+            limiter.release(res.status, res.headers, monotonic() - start)
+            # a throttled request never reached the panel, so it is safe to send again
+            if res.status != 429:
+                break
+        
+        return res, body
+    
+    async def _response(self,
+                        method: str,
+                        path: str,
+                        data: bytes,
+                        stream: bool=False,
+                        headers: dict=None) -> tuple:
+        retry = self.retry_policy
+        breaker = self.circuit_breaker
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f'circuit open for {self.domain}')
+            
+            try:
+                res, body = await self._attempt(method, path, data, stream, headers)
+            except self._errors:
+                if breaker is not None:
+                    breaker.failure()
+                
+                if retry is None or not retry.retryable(method, attempt, path=path):
+                    raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                
+                raise
+            else:
+                if breaker is not None:
+                    if res.status >= 500:
+                        breaker.failure()
+                    else:
+                        breaker.success()
+                
+                if retry is None or not retry.retryable(method, attempt, res.status, path):
+                    return res, body
+            
+            await asyncio.sleep(retry.delay(attempt))
+            attempt += 1
+    
+    async def _send(self, method: str, path: str, data: bytes) -> dict:
+        return (await self._response(method, path, data))[1]
+    
+    async def _revalidate(self, path: str, validators: Optional[tuple]) -> tuple:
+        res, body = await self._response('GET', path, None, headers=_conditional_headers(validators))
+        if res.status == 304:
+            return None, validators
+        
+        return body, _validators(res.headers) if res.ok else None
+    
+    async def _stream(self, path: str) -> AsyncIterator[bytes]:
+        res, body = await self._response('GET', path, None, True)
+        if body is not None:
+            raise Exception(body)
+        
+        with res:
+            async for chunk in res.chunks:
+                self.metrics._received('GET', path, len(chunk))
+                yield chunk
+    
+    async def flush(self) -> list:
+        '''Sends all buffered coin changes. Returns a list of `(user, failure)` pairs for those that failed.'''
+        if self.coin_buffer is None:
+            return []
+        
+        return await self.coin_buffer.flush()
+    
+    async def close(self):
+        '''Stops background syncing, sends buffered coin changes, finishes writes to the store,
+        then closes all pooled connections held by the client.'''
+        if self.sync is not None:
+            self.sync.close()
+        
+        if self.coin_buffer is not None:
+            await self.coin_buffer.close()
+        
+        if self._writer is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._writer.shutdown)
+            self._writer = None
+        
+        await self.transport.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *_):
+        await self.close()
+    
+    async def ping(self) -> float:
+        '''Pings the Dashactyl API. Returns the round trip in seconds.'''
+        start = monotonic()
+        await self.request('GET', '/api')
+        return monotonic() - start
+    
+    async def ping_stats(self, samples: int=10) -> dict:
+        '''`samples` - The number of pings to send (defaults to 10)
+        
+        Pings the Dashactyl API several times. Returns a dict of the min, median and p99 round trip in seconds.
+        '''
+        if samples < 1:
+            raise ValueError('samples must be greater than 0')
+        
+        return self._summary([await self.ping() for _ in range(samples)])
+
+
+class AsyncDashactylCluster(DashactylCluster):
+    '''# Dashactyl.py
+    ### One asyncio client for several Dashactyl panels.
+    
+    Takes `AsyncDashactyl` clients. Every method that talks to a panel is awaitable,
+    and functions given to `broadcast` must return awaitables.
+    '''
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *_):
+        await self.close()
+    
+    async def _fan_out(self, fn) -> dict:
+        async def call(client: AsyncDashactyl):
+            try:
+                return await fn(client)
+            except Exception as e:
+                return e
+        
+        names = list(self.panels)
+        return dict(zip(names, await asyncio.gather(*(call(self.panels[n]) for n in names))))
+    
+    async def fetch_users(self,
+                        ids: Iterable[int],
+                        concurrency: int=8) -> AsyncIterator[Tuple[int, Union[DashUser, dict, Exception]]]:
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
+        
+        out = asyncio.Queue()
+        done = object()
+        
+        async def drain(client: AsyncDashactyl, group: list):
+            try:
+                async for pair in client.users.fetch_many(group, concurrency):
+                    await out.put(pair)
+            finally:
+                await out.put(done)
+        
+        tasks = [asyncio.ensure_future(drain(self.panels[name], group))
+                    for name, group in self._grouped(ids).items()]
+        try:
+            running = len(tasks)
+            while running:
+                pair = await out.get()
+                if pair is done:
+                    running -= 1
+                else:
+                    yield pair
+            
+            for t in tasks:
+                t.result()
+        finally:
+            for t in tasks:
+                t.cancel()
+    
+    async def fetch_coupons(self) -> Tuple[List[Coupon], dict]:
+        return self._merged(await self._fan_out(lambda c: c.coupons.fetch()))
+    
+    async def close(self):
+        '''Closes the clients of every panel.'''
+        await asyncio.gather(*(c.close() for c in self.panels.values()))
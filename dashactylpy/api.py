@@ -1,28 +1,212 @@
-import requests
-from json import dumps
-from time import time
-from .managers import DashUserManager, DashServerManager, CouponManager
+from threading import Event, Lock
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, Optional
+from .cache import CachePolicy
+from .metrics import Metrics
+from .codec import JSONCodec, default_codec
+from .retry import RetryPolicy, CircuitBreaker, CircuitOpenError
+from .managers import CoinBuffer, CoinsManager, DashUserManager, DashServerManager, \
+    CouponManager, DashUserServerManager, ResourceManager
+from .sync import SyncEngine
+from .transport import Transport, HTTPTransport, HTTP2Transport, Response
+
+if TYPE_CHECKING:
+    from .ratelimit import RateLimiter
+    from .store import SQLiteStore
 
 
 __all__ = ('Dashactyl')
 
+def _conditional_headers(validators: Optional[tuple]) -> Optional[dict]:
+    if not validators:
+        return None
+    
+    etag, modified = validators
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    
+    if modified:
+        headers['If-Modified-Since'] = modified
+    
+    return headers
+
+
+def _validators(headers: Mapping[str, str]) -> Optional[tuple]:
+    etag = headers.get('ETag')
+    modified = headers.get('Last-Modified')
+    if etag is None and modified is None:
+        return None
+    
+    return etag, modified
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
 class Dashactyl:
     '''# Dashactyl.py
     ### An interactive API wrapper for Dashactyl in Python.
     '''
-    def __init__(self, domain: str, auth: str):
+    _users_cls = DashUserManager
+    _servers_cls = DashServerManager
+    _coupons_cls = CouponManager
+    _coins_cls = CoinsManager
+    _user_servers_cls = DashUserServerManager
+    _resources_cls = ResourceManager
+    _coin_buffer_cls = CoinBuffer
+    _sync_cls = SyncEngine
+    
+    def __init__(self,
+                domain: str,
+                auth: str,
+                pool_connections: int=1,
+                pool_maxsize: int=10,
+                keep_alive: bool=True,
+                cache_policy: CachePolicy=None,
+                coalesce_reads: bool=True,
+                rate_limiter: 'RateLimiter'=None,
+                retry_policy: RetryPolicy=None,
+                circuit_breaker: CircuitBreaker=None,
+                codec: JSONCodec=None,
+                store: 'SQLiteStore'=None,
+                metrics: Metrics=None,
+                buffer_coins: bool=False,
+                coin_flush_interval: float=1.0,
+                check_quota: bool=True,
+                sync_users: bool=False,
+                sync_budget: float=2.0,
+                sync_interval: float=30.0,
+                transport: Transport=None,
+                http2: bool=False,
+                max_revalidations: int=4):
         '''`domain` - The Dashactyl panel domain
-
+        
         `auth` - The authentication key for the Pterodactyl panel
         
+        `pool_connections` - The number of host pools to keep (defaults to 1)
+        
+        `pool_maxsize` - The maximum number of connections kept per host (defaults to 10)
+        
+        `keep_alive` - Whether connections should be reused between requests (defaults to `True`)
+        
+        `cache_policy` - The default size and expiry policy for the managers' caches
+        
+        `coalesce_reads` - Whether concurrent identical GET requests should share one response (defaults to `True`)
+        
+        `rate_limiter` - The rate limiter requests are queued through
+        
+        `retry_policy` - The policy for retrying failed idempotent requests
+        
+        `circuit_breaker` - The circuit breaker that fails requests fast while the panel is down
+        
+        `codec` - The JSON codec for request and response bodies (defaults to the fastest installed)
+        
+        `store` - The persistent store the users' and coupons' caches are restored from and saved to
+        
+        `metrics` - The metrics requests and cache lookups are recorded to (a new set if not given)
+        
+        `buffer_coins` - Whether coin changes should be merged per user and sent in the background (defaults to `False`).
+        Buffered changes are sent by `flush()` or `close()`, so close the client before exiting
+        
+        `coin_flush_interval` - The number of seconds between sends of buffered coin changes (defaults to 1)
+        
+        `check_quota` - Whether creates and modifies that would take a cached user past their resources
+        should be refused before they are sent (defaults to `True`)
+        
+        `sync_users` - Whether cached users should be polled in the background and patched when they change (defaults to `False`)
+        
+        `sync_budget` - The largest number of background polls sent per second (defaults to 2)
+        
+        `sync_interval` - The number of seconds between background polls of a user in use (defaults to 30)
+        
+        `transport` - The transport requests are sent through (pooled HTTP/1.1 connections if not given)
+        
+        `http2` - Whether the default transport should multiplex requests over HTTP/2 (defaults to `False`, requires `httpx`)
+        
+        `max_revalidations` - The largest number of stale cache entries revalidated in the background at once (defaults to 4)
+        
         Creates a new client to interact with Dashactyl.
         '''
         self.domain = domain.removesuffix('/')
         self.auth = 'Bearer '+ auth
+        self.headers = {'Content-Type': 'application/json',
+                        'Authorization': self.auth}
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+        
+        self.cache_policy = cache_policy
+        self.coalesce_reads = coalesce_reads
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.codec = codec or default_codec()
+        self.store = store
+        self.metrics = metrics or Metrics()
+        self.coin_buffer = self._coin_buffer_cls(self, coin_flush_interval) if buffer_coins else None
+        self.check_quota = check_quota
+        if max_revalidations < 1:
+            raise ValueError('max_revalidations must be greater than 0')
+        
+        self.max_revalidations = max_revalidations
+        self._flights = {}
+        self._flights_lock = Lock()
+        self.transport = transport or self._connect(pool_connections, pool_maxsize, keep_alive, http2)
+        self._errors = self.transport.errors
+        
+        self.users = self._users_cls(self)
+        self.servers = self._servers_cls(self)
+        self.coupons = self._coupons_cls(self)
+        self.sync = self._sync_cls(self, sync_budget, sync_interval) if sync_users else None
+        if self.sync is not None:
+            self.sync._attach(self.users.cache)
+        
+        if store is not None:
+            self.users._restore(store)
+            self.coupons._restore(store)
+    
+    def _connect(self, pool_connections: int, pool_maxsize: int, keep_alive: bool, http2: bool) -> Transport:
+        if http2:
+            return HTTP2Transport(pool_maxsize)
         
-        self.users = DashUserManager(self)
-        self.servers = DashServerManager(self)
-        self.coupons = CouponManager(self)
+        return HTTPTransport(pool_connections, pool_maxsize)
+    
+    def _prepare(self, method: str, params: dict) -> bytes:
+        if method not in ('GET', 'POST', 'PATCH', 'DELETE'):
+            raise ValueError("method must be 'GET', 'POST', 'PATCH', or 'DELETE'.")
+        
+        if len(params):
+            return self.codec.dumps(params)
+        
+        return None
+    
+    def _write(self, fn, *args):
+        fn(*args)
+    
+    def _persist(self, kind: str, entries: Iterable[tuple]):
+        if self.store is not None:
+            self._write(self.store.put, kind, [(str(key), self.codec.dumps(data), validators)
+                                                for key, data, validators in entries])
+    
+    def _touch(self, kind: str, key: str):
+        if self.store is not None:
+            self._write(self.store.touch, kind, str(key))
+    
+    def _forget(self, kind: str, key: str):
+        if self.store is not None:
+            self._write(self.store.delete, kind, str(key))
+    
+    @staticmethod
+    def _failed(code: int, reason: str) -> dict:
+        return {'status': 'failed',
+                'code': code,
+                'message': reason}
     
     def request(self, method: str, path: str, params: dict={}) -> dict:
         '''### Not for public use.
@@ -34,41 +218,257 @@ class Dashactyl:
         `params` - Optional additional parameters for the request
         
         Performs an API request to the path then returns a dict response.
+        Concurrent identical GET requests share one call and the same response dict.
         '''
-        if method not in ('GET', 'POST', 'PATCH', 'DELETE'):
-            raise ValueError("method must be 'GET', 'POST', 'PATCH', or 'DELETE'.")
+        data = self._prepare(method, params)
+        if method != 'GET' or not self.coalesce_reads:
+            return self._send(method, path, data)
         
-        req = requests.get
-        if method == 'POST':
-            req = requests.post
-        elif method == 'PATCH':
-            req = requests.patch
-        elif method == 'DELETE':
-            req = requests.delete
+        return self._coalesce(path, self._send, method, path, data)
+    
+    def conditional(self, path: str, validators: tuple=None) -> tuple:
+        '''### Not for public use.
         
-        path = self.domain + path
-        if len(params):
-            params = dumps(params)
-        else:
-            params = None
+        `path` - The path to request
+        
+        `validators` - The `(etag, last_modified)` pair of the cached response, if any
+        
+        Performs a GET request that the panel may answer with 304 if the cached response is unchanged.
+        Returns the dict response, or `None` if unchanged, and the validators of the response.
+        '''
+        if not self.coalesce_reads:
+            return self._revalidate(path, validators)
+        
+        return self._coalesce((path, validators), self._revalidate, path, validators)
+    
+    _revalidator = None
+    
+    def _background(self, call, *args):
+        # stale entries are revalidated on a few shared threads, however many of them are looked up at once
+        with self._flights_lock:
+            if self._revalidator is None:
+                from concurrent.futures import ThreadPoolExecutor
+                
+                self._revalidator = ThreadPoolExecutor(self.max_revalidations, 'dashactyl-revalidate')
+        
+        self._revalidator.submit(call, *args)
+    
+    def _coalesce(self, key, call, *args):
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
         
-        res = req(path,
-                    data=params,
-                    headers={'Content-Type': 'application/json',
-                            'Authorization': self.auth})
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            
+            return flight.result
+        
+        try:
+            flight.result = call(*args)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            
+            flight.done.set()
+    
+    def _exchange(self,
+                method: str,
+                path: str,
+                data: bytes,
+                stream: bool,
+                headers: dict) -> Response:
+        metrics = self.metrics
+        sent = len(data) if data else 0
+        headers = self.headers if headers is None else {**self.headers, **headers}
+        metrics._before(method, path)
+        start = monotonic()
+        try:
+            res = self.transport.send(method, self.domain + path, data, headers, stream)
+        except BaseException:
+            metrics._after(method, path, None, monotonic() - start, sent, 0)
+            raise
+        
+        metrics._after(method, path, res.status, monotonic() - start, sent, 0 if stream else len(res.content))
+        return res
+    
+    def _attempt(self,
+                method: str,
+                path: str,
+                data: bytes,
+                stream: bool,
+                headers: dict=None) -> Response:
+        limiter = self.rate_limiter
+        if limiter is None:
+            return self._exchange(method, path, data, stream, headers)
+        
+        for attempt in range(limiter.retries + 1):
+            if attempt:
+                res.close()
+            
+            limiter.acquire()
+            start = monotonic()
+            try:
+                res = self._exchange(method, path, data, stream, headers)
+            except BaseException:
+                limiter.release(None, {}, monotonic() - start)
+                raise
+            
+            limiter.release(res.status, res.headers, monotonic() - start)
+            # a throttled request never reached the panel, so it is safe to send again
+            if res.status != 429:
+                break
+        
+        return res
+    
+    def _response(self,
+                method: str,
+                path: str,
+                data: bytes,
+                stream: bool=False,
+                headers: dict=None) -> Response:
+        retry = self.retry_policy
+        breaker = self.circuit_breaker
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f'circuit open for {self.domain}')
+            
+            try:
+                res = self._attempt(method, path, data, stream, headers)
+            except self._errors:
+                if breaker is not None:
+                    breaker.failure()
+                
+                if retry is None or not retry.retryable(method, attempt, path=path):
+                    raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                
+                raise
+            else:
+                if breaker is not None:
+                    if res.status >= 500:
+                        breaker.failure()
+                    else:
+                        breaker.success()
+                
+                if retry is None or not retry.retryable(method, attempt, res.status, path):
+                    return res
+                
+                res.close()
+            
+            sleep(retry.delay(attempt))
+            attempt += 1
+    
+    def _read(self, res: Response) -> Optional[dict]:
+        if res.status == 304:
+            return None
         
         if res.ok:
-            if res.status_code == 204:
+            if res.status == 204:
                 return {'status': 'success'}
             
-            return res.json()
+            return self.codec.loads(res.content)
         
-        return {'status': 'failed',
-                'code': res.status_code,
-                'message': res.reason}
+        return self._failed(res.status, res.reason)
+    
+    def _send(self, method: str, path: str, data: bytes) -> dict:
+        return self._read(self._response(method, path, data))
+    
+    def _revalidate(self, path: str, validators: Optional[tuple]) -> tuple:
+        res = self._response('GET', path, None, headers=_conditional_headers(validators))
+        if res.status == 304:
+            return None, validators
+        
+        return self._read(res), _validators(res.headers) if res.ok else None
+    
+    def _stream(self, path: str) -> Iterator[bytes]:
+        res = self._response('GET', path, None, True)
+        with res:
+            if not res.ok:
+                raise Exception(self._failed(res.status, res.reason))
+            
+            for chunk in res.chunks:
+                self.metrics._received('GET', path, len(chunk))
+                yield chunk
+    
+    @property
+    def healthy(self) -> bool:
+        '''Whether the client is sending requests, `False` while its circuit is open.'''
+        return self.circuit_breaker is None or self.circuit_breaker.state != 'open'
+    
+    def health(self) -> dict:
+        '''Returns a dict of the client's health and the state of its circuit breaker, retries and rate limiter.'''
+        res = {'healthy': self.healthy}
+        if self.circuit_breaker is not None:
+            res['circuit'] = self.circuit_breaker.stats()
+        
+        if self.retry_policy is not None:
+            res['retries'] = self.retry_policy.attempts
+        
+        if self.rate_limiter is not None:
+            res['rate_limiter'] = self.rate_limiter.stats()
+        
+        return res
+    
+    def flush(self) -> list:
+        '''Sends all buffered coin changes. Returns a list of `(user, failure)` pairs for those that failed.'''
+        if self.coin_buffer is None:
+            return []
+        
+        return self.coin_buffer.flush()
+    
+    def close(self):
+        '''Stops background syncing and revalidation, sends buffered coin changes,
+        then closes all pooled connections held by the client.'''
+        if self.sync is not None:
+            self.sync.close()
+        
+        if self._revalidator is not None:
+            self._revalidator.shutdown(cancel_futures=True)
+            self._revalidator = None
+        
+        if self.coin_buffer is not None:
+            self.coin_buffer.close()
+        
+        self.transport.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.close()
     
     def ping(self) -> float:
-        '''Pings the Dashactyl API.'''
-        start = time()
+        '''Pings the Dashactyl API. Returns the round trip in seconds.'''
+        start = monotonic()
         self.request('GET', '/api')
-        return time() - start
+        return monotonic() - start
+    
+    @staticmethod
+    def _summary(samples: list) -> dict:
+        from statistics import median, quantiles
+        
+        return {'samples': len(samples),
+                'min': min(samples),
+                'median': median(samples),
+                'p99': quantiles(samples, n=100, method='inclusive')[98] if len(samples) > 1 else samples[0]}
+    
+    def ping_stats(self, samples: int=10) -> dict:
+        '''`samples` - The number of pings to send (defaults to 10)
+        
+        Pings the Dashactyl API several times. Returns a dict of the min, median and p99 round trip in seconds.
+        '''
+        if samples < 1:
+            raise ValueError('samples must be greater than 0')
+        
+        return self._summary([self.ping() for _ in range(samples)])
@@ -0,0 +1,372 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from sys import getsizeof
+from threading import RLock
+from time import monotonic
+from types import FunctionType
+from typing import Any, Optional
+
+
+__all__ = ('Cache', 'CachePolicy')
+
+def _sizeof(value: Any) -> int:
+    size = getsizeof(value)
+    for v in getattr(value, '__dict__', {}).values():
+        size += getsizeof(v)
+    
+    for cls in type(value).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            size += getsizeof(getattr(value, name, None))
+    
+    return size
+
+
+class CachePolicy:
+    '''Limits for how many structures a cache holds and for how long.'''
+    def __init__(self,
+                max_size: int=None,
+                ttl: float=None,
+                stale_while_revalidate: bool=False):
+        '''`max_size` - The maximum number of entries before the least recently used is evicted
+        
+        `ttl` - The number of seconds an entry stays fresh for
+        
+        `stale_while_revalidate` - Whether expired entries should be returned while they are refreshed in the background
+        
+        Creates a new cache policy. The default policy never evicts or expires entries.
+        '''
+        if max_size is not None and max_size < 1:
+            raise ValueError('max_size must be greater than 0')
+        
+        if ttl is not None and ttl <= 0:
+            raise ValueError('ttl must be greater than 0')
+        
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+    
+    def __repr__(self) -> str:
+        return (f'<CachePolicy max_size={self.max_size} ttl={self.ttl} '
+                f'stale_while_revalidate={self.stale_while_revalidate}>')
+
+
+class Cache(MutableMapping):
+    '''A dict of cached structures with hash indexes on their attributes.'''
+    def __init__(self,
+                key: str,
+                *indexes: str,
+                groups: tuple=(),
+                policy: CachePolicy=None):
+        '''`key` - The attribute the cache is keyed by
+        
+        `indexes` - Other unique attributes the cache can look structures up by
+        
+        `groups` - Attributes shared by many structures that the cache groups structures by
+        
+        `policy` - The eviction and expiry policy for the cache
+        
+        Creates a new indexed cache.
+        '''
+        self.key = key
+        self.revalidate: Optional[FunctionType] = None
+        self.observe: Optional[FunctionType] = None
+        self.changed: Optional[FunctionType] = None
+        self.accessed: Optional[FunctionType] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._indexes = {i: {} for i in indexes}
+        self._groups = {g: {} for g in groups}
+        self._attrs = (*indexes, *groups)
+        self._indexed = {}
+        self._expires = {}
+        self._sizes = {}
+        self._validators = {}
+        self._revalidating = set()
+        self._warm = set()
+        self._lock = RLock()
+        self._policy = policy or CachePolicy()
+    
+    @property
+    def policy(self) -> CachePolicy:
+        return self._policy
+    
+    @policy.setter
+    def policy(self, policy: CachePolicy):
+        with self._lock:
+            self._policy = policy or CachePolicy()
+            self.__trim()
+    
+    def __getitem__(self, key: Any) -> Any:
+        return self._data[key]
+    
+    def __setitem__(self, key: Any, value: Any):
+        with self._lock:
+            old = self._data.get(key)
+            if old is not None:
+                self.__unindex(key)
+            
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.__index(key, value)
+            
+            size = _sizeof(value)
+            self.bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            if self._policy.ttl:
+                self._expires[key] = monotonic() + self._policy.ttl
+            
+            self._revalidating.discard(key)
+            if self.changed is not None:
+                self.changed(old, value)
+            
+            self.__trim()
+    
+    def __delitem__(self, key: Any):
+        with self._lock:
+            old = self._data.pop(key)
+            self.__unindex(key)
+            if self.changed is not None:
+                self.changed(old, None)
+    
+    def __iter__(self):
+        return iter(self._data)
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+    
+    def __repr__(self) -> str:
+        return f'<Cache key={self.key!r} size={len(self._data)}>'
+    
+    def __index(self, key: Any, value: Any):
+        # the indexed values are kept so entries updated in place can be unindexed
+        values = self._indexed[key] = tuple(getattr(value, a, None) for a in self._attrs)
+        for index, v in zip(self._indexes.values(), values):
+            if v is not None:
+                index[str(v)] = key
+        
+        for group, v in zip(self._groups.values(), values[len(self._indexes):]):
+            group.setdefault(v, {})[key] = None
+    
+    def __unindex(self, key: Any):
+        values = self._indexed.pop(key, ())
+        for index, v in zip(self._indexes.values(), values):
+            if v is not None and index.get(str(v)) == key:
+                del index[str(v)]
+        
+        for group, v in zip(self._groups.values(), values[len(self._indexes):]):
+            keys = group.get(v)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del group[v]
+        
+        self.bytes -= self._sizes.pop(key, 0)
+        self._expires.pop(key, None)
+        self._validators.pop(key, None)
+        self._revalidating.discard(key)
+        self._warm.discard(key)
+    
+    def __evict(self, key: Any):
+        old = self._data.pop(key)
+        self.__unindex(key)
+        self.evictions += 1
+        if self.changed is not None:
+            self.changed(old, None)
+    
+    def __trim(self):
+        if self._policy.max_size:
+            while len(self._data) > self._policy.max_size:
+                self.__evict(next(iter(self._data)))
+    
+    def __resolve(self, value: Any, attr: str=None) -> Any:
+        if attr is not None:
+            return self._indexes[attr].get(str(value))
+        
+        if value in self._data:
+            return value
+        
+        value = str(value)
+        for index in self._indexes.values():
+            if value in index:
+                return index[value]
+        
+        return None
+    
+    def add(self, value: Any, validators: tuple=None, age: float=None) -> Any:
+        '''`value` - The structure to cache
+        
+        `validators` - The `(etag, last_modified)` pair the structure's response was served with
+        
+        `age` - The number of seconds since the structure's response was received, for structures restored from a store
+        
+        Caches a structure under its key attribute and returns it. Restored structures are served once
+        they are stale and revalidated in the background, whatever the policy. Without a TTL they are
+        stale straight away.
+        '''
+        key = getattr(value, self.key)
+        with self._lock:
+            self[key] = value
+            if validators:
+                self._validators[key] = validators
+            
+            if age is not None:
+                self._expires[key] = self._expires.get(key, monotonic()) - age
+                self._warm.add(key)
+        
+        return value
+    
+    def peek(self, value: Any, attr: str=None) -> Optional[Any]:
+        '''`value` - The key or any indexed attribute value
+        
+        `attr` - The indexed attribute to look the value up by, instead of trying all of them
+        
+        Gets a cached structure even if it has expired, without counting a hit or miss.
+        '''
+        with self._lock:
+            key = self.__resolve(value, attr)
+            return None if key is None else self._data[key]
+    
+    def validators(self, key: Any) -> Optional[tuple]:
+        '''`key` - The key of the entry
+        
+        Gets the `(etag, last_modified)` pair stored with an entry, if its response had any.
+        '''
+        return self._validators.get(key)
+    
+    def refresh(self, key: Any):
+        '''`key` - The key of the entry
+        
+        Marks an entry as fresh again without replacing it, as when the panel reports it unchanged.
+        '''
+        with self._lock:
+            if key not in self._data:
+                return
+            
+            self._data.move_to_end(key)
+            if self._policy.ttl:
+                self._expires[key] = monotonic() + self._policy.ttl
+            else:
+                self._expires.pop(key, None)
+            
+            self._revalidating.discard(key)
+            self._warm.discard(key)
+    
+    def lookup(self, value: Any, attr: str=None) -> Optional[Any]:
+        '''`value` - The key or any indexed attribute value
+        
+        `attr` - The indexed attribute to look the value up by, instead of trying all of them
+        
+        Gets a cached structure by its key or any of its indexed attributes.
+        Expired entries are dropped, or returned and revalidated if the policy allows it.
+        Expired entries with validators are kept so they can be revalidated with a conditional request.
+        '''
+        stale = False
+        with self._lock:
+            key = self.__resolve(value, attr)
+            if key is not None and key in self._expires and self._expires[key] <= monotonic():
+                swr = self._policy.stale_while_revalidate or key in self._warm
+                if not (swr and self.revalidate):
+                    if key not in self._validators:
+                        self.__evict(key)
+                    
+                    key = None
+                elif key not in self._revalidating:
+                    self._revalidating.add(key)
+                    stale = True
+            
+            if key is None:
+                self.misses += 1
+                value = None
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = self._data[key]
+        
+        if self.observe is not None:
+            self.observe(value is not None)
+        
+        if self.accessed is not None and value is not None:
+            self.accessed(key)
+        
+        if stale:
+            self.revalidate(value)
+        
+        return value
+    
+    def group(self, attr: str, value: Any) -> list:
+        '''`attr` - The grouped attribute
+        
+        `value` - The value of the attribute
+        
+        Gets all cached structures with the value for a grouped attribute.
+        '''
+        with self._lock:
+            return [self._data[k] for k in self._groups[attr].get(value, ())]
+    
+    def where(self, **attrs: Any) -> list:
+        '''`attrs` - The attribute values to match
+        
+        Gets all cached structures matching every value. Candidates come from the smallest of the
+        matching groups and indexes, so only attributes without one are checked entry by entry.
+        '''
+        with self._lock:
+            found = []
+            for attr, value in attrs.items():
+                if attr in self._groups:
+                    found.append(self._groups[attr].get(value, {}))
+                elif attr == self.key:
+                    found.append((value,) if value in self._data else ())
+                elif attr in self._indexes:
+                    key = self._indexes[attr].get(str(value))
+                    found.append(() if key is None else (key,))
+            
+            if found:
+                found.sort(key=len)
+                keys = (k for k in found[0] if all(k in f for f in found[1:]))
+            else:
+                keys = iter(self._data)
+            
+            # unique indexes are keyed by string, so every value is still compared
+            return [v for v in map(self._data.__getitem__, keys)
+                    if all(getattr(v, a, None) == value for a, value in attrs.items())]
+    
+    def count(self, attr: str) -> dict:
+        '''`attr` - The grouped attribute
+        
+        Returns a dict of the number of cached structures for each value of a grouped attribute.
+        '''
+        with self._lock:
+            return {v: len(keys) for v, keys in self._groups[attr].items()}
+    
+    def revalidated(self, key: Any):
+        '''`key` - The key of the revalidated entry
+        
+        Marks a background revalidation as finished so the entry can be refreshed again.
+        '''
+        self._revalidating.discard(key)
+    
+    def prune(self) -> int:
+        '''Drops all expired entries, except restored ones waiting to be revalidated.
+        Returns the number of entries dropped.
+        '''
+        with self._lock:
+            now = monotonic()
+            expired = [k for k, t in self._expires.items() if t <= now and k not in self._warm]
+            for k in expired:
+                self.__evict(k)
+            
+            return len(expired)
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the cache's size, approximate bytes, hits, misses and evictions.'''
+        return {'size': len(self._data),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
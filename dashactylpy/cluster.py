@@ -0,0 +1,303 @@
+from bisect import bisect, insort
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+from .api import Dashactyl
+from .structures import Coupon, DashUser
+
+
+__all__ = ('HashRing', 'DashactylCluster')
+
+def _hash(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    '''Consistent hashing of keys onto named nodes. Adding or removing a node only moves the keys it owns.'''
+    def __init__(self, nodes: Iterable[str]=(), replicas: int=64):
+        '''`nodes` - The names of the nodes
+        
+        `replicas` - The number of points each node has on the ring, which evens out how keys are spread (defaults to 64)
+        '''
+        if replicas < 1:
+            raise ValueError('replicas must be greater than 0')
+        
+        self.replicas = replicas
+        self._points: List[Tuple[int, str]] = []
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+    
+    def __repr__(self) -> str:
+        return f'<HashRing nodes={len(self._nodes)} replicas={self.replicas}>'
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+    
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        
+        self._nodes.add(node)
+        for i in range(self.replicas):
+            insort(self._points, (_hash(f'{node}#{i}'), node))
+    
+    def remove(self, node: str):
+        self._nodes.discard(node)
+        self._points = [p for p in self._points if p[1] != node]
+    
+    def get(self, key: Any) -> str:
+        '''`key` - The key, hashed by its string form so `5` and `'5'` land on the same node
+        
+        Gets the name of the node that owns a key.
+        '''
+        if not self._points:
+            raise LookupError('the ring has no nodes')
+        
+        i = bisect(self._points, (_hash(str(key)),))
+        return self._points[i % len(self._points)][1]
+
+
+class DashactylCluster:
+    '''# Dashactyl.py
+    ### One client for several Dashactyl panels.
+    
+    Users are routed to a panel by ID and coupons by code, through an explicit map first and a
+    consistent hash ring otherwise. Pings, coupon listings and bulk fetches go to all panels at once.
+    '''
+    def __init__(self,
+                panels: Mapping[str, Dashactyl],
+                routes: Mapping[Union[int, str], str]=None,
+                replicas: int=64):
+        '''`panels` - The clients of the panels, by name
+        
+        `routes` - The panel names of user IDs and coupon codes that are not placed by hashing
+        
+        `replicas` - The number of points each panel has on the hash ring (defaults to 64)
+        
+        Creates a new cluster. Every panel must be a client of the same kind, sync or async.
+        '''
+        if not panels:
+            raise ValueError('at least one panel is required')
+        
+        self.panels: Dict[str, Dashactyl] = dict(panels)
+        self.ring = HashRing(self.panels, replicas)
+        self.routes: Dict[str, str] = {}
+        for key, name in (routes or {}).items():
+            self.pin(key, name)
+    
+    def __repr__(self) -> str:
+        return f'<DashactylCluster panels={list(self.panels)} routes={len(self.routes)}>'
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.close()
+    
+    def _check(self, name: str):
+        if name not in self.panels:
+            raise KeyError(f'no panel named {name!r}')
+    
+    def add(self, name: str, client: Dashactyl):
+        '''`name` - The name of the panel
+        
+        `client` - The client of the panel
+        
+        Adds a panel. Only the keys it now owns on the ring move to it.
+        '''
+        self.panels[name] = client
+        self.ring.add(name)
+    
+    def remove(self, name: str) -> Dashactyl:
+        '''`name` - The name of the panel
+        
+        Removes a panel and the routes pinned to it, and returns its client without closing it.
+        '''
+        self._check(name)
+        if len(self.panels) == 1:
+            raise ValueError('cannot remove the last panel')
+        
+        self.ring.remove(name)
+        self.routes = {k: v for k, v in self.routes.items() if v != name}
+        return self.panels.pop(name)
+    
+    def pin(self, key: Union[int, str], name: str):
+        '''`key` - The user ID or coupon code
+        
+        `name` - The name of the panel that owns it
+        
+        Routes a user or coupon to a panel regardless of the hash ring.
+        '''
+        self._check(name)
+        self.routes[str(key)] = name
+    
+    def locate(self, key: Union[int, str]) -> str:
+        '''`key` - The user ID or coupon code
+        
+        Gets the name of the panel that owns a user or coupon.
+        '''
+        return self.routes.get(str(key)) or self.ring.get(key)
+    
+    def route(self, key: Union[int, str]) -> Dashactyl:
+        '''`key` - The user ID or coupon code
+        
+        Gets the client of the panel that owns a user or coupon.
+        '''
+        return self.panels[self.locate(key)]
+    
+    def _grouped(self, keys: Iterable[Union[int, str]]) -> Dict[str, list]:
+        groups = {}
+        for key in dict.fromkeys(keys):
+            groups.setdefault(self.locate(key), []).append(key)
+        
+        return groups
+    
+    def _fan_out(self, fn: Callable[[Dashactyl], Any]) -> Dict[str, Any]:
+        # one thread per panel, so the slowest panel sets the pace rather than the sum of them
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def call(client: Dashactyl) -> Any:
+            try:
+                return fn(client)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=len(self.panels)) as pool:
+            futures = {name: pool.submit(call, c) for name, c in self.panels.items()}
+        
+        return {name: f.result() for name, f in futures.items()}
+    
+    @staticmethod
+    def _merged(results: Dict[str, Any]) -> Tuple[List[Coupon], Dict[str, Union[dict, Exception]]]:
+        coupons = []
+        failures = {}
+        for name, res in results.items():
+            if isinstance(res, list):
+                coupons.extend(res)
+            else:
+                failures[name] = res
+        
+        return coupons, failures
+    
+    def broadcast(self, fn: Callable[[Dashactyl], Any]) -> Dict[str, Any]:
+        '''`fn` - A function called with the client of each panel
+        
+        Calls a function for every panel at once. Returns a dict of the results by panel name,
+        with the exception in place of the result for panels where it raised.
+        '''
+        return self._fan_out(fn)
+    
+    def ping(self) -> Dict[str, Union[float, Exception]]:
+        '''Pings every panel at once. Returns a dict of the round trips in seconds by panel name,
+        with the exception in place of the round trip for panels that could not be reached.
+        '''
+        return self._fan_out(lambda c: c.ping())
+    
+    def health(self) -> Dict[str, dict]:
+        '''Returns a dict of the health of every panel's client by panel name.'''
+        return {name: c.health() for name, c in self.panels.items()}
+    
+    def fetch_user(self, id: int) -> Optional[DashUser]:
+        '''`id` - The ID of the user
+        
+        Fetches a user from the panel that owns it.
+        '''
+        return self.route(id).users.fetch(id)
+    
+    def get_user(self, id: int) -> Optional[DashUser]:
+        '''`id` - The ID of the user
+        
+        Gets a user from the owning panel's cache, or fetches it if it is not cached.
+        '''
+        return self.route(id).users.get(id)
+    
+    def fetch_users(self,
+                    ids: Iterable[int],
+                    concurrency: int=8) -> Iterator[Tuple[int, Union[DashUser, dict, Exception]]]:
+        '''`ids` - The IDs of the users
+        
+        `concurrency` - The maximum number of requests in flight per panel (defaults to 8)
+        
+        Fetches many users from all of their panels at once, like `DashUserManager.fetch_many`.
+        Yields `(id, user)` pairs as they complete, whichever panel they come from.
+        '''
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
+        
+        groups = self._grouped(ids)
+        if len(groups) < 2:
+            for name, group in groups.items():
+                yield from self.panels[name].users.fetch_many(group, concurrency)
+            
+            return
+        
+        from concurrent.futures import ThreadPoolExecutor
+        from queue import SimpleQueue
+        
+        out = SimpleQueue()
+        done = object()
+        
+        def drain(client: Dashactyl, group: list):
+            try:
+                for pair in client.users.fetch_many(group, concurrency):
+                    out.put(pair)
+            finally:
+                out.put(done)
+        
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            futures = [pool.submit(drain, self.panels[name], group) for name, group in groups.items()]
+            running = len(futures)
+            while running:
+                pair = out.get()
+                if pair is done:
+                    running -= 1
+                else:
+                    yield pair
+        
+        for f in futures:
+            f.result()
+    
+    def fetch_coupons(self) -> Tuple[List[Coupon], Dict[str, Union[dict, Exception]]]:
+        '''Fetches the coupons of every panel at once. Returns a list of all the coupons and a dict of
+        the failed response or raised exception by panel name for panels that could not be listed.
+        '''
+        return self._merged(self._fan_out(lambda c: c.coupons.fetch()))
+    
+    def get_coupon(self, code: str) -> Optional[Coupon]:
+        '''`code` - The code of the coupon
+        
+        Gets a coupon from the owning panel's cache, or fetches it if it is not cached.
+        '''
+        return self.route(code).coupons.get(code)
+    
+    def create_coupon(self,
+                        code: str=None,
+                        coins: int=0,
+                        ram: float=0,
+                        disk: float=0,
+                        cpu: float=0,
+                        servers: int=0) -> Coupon:
+        '''Creates a coupon on the panel that owns its code, like `CouponManager.create`.
+        Coupons without a code are given a random one here, so they can be routed again later.
+        '''
+        if not code:
+            from secrets import token_hex
+            
+            code = token_hex(8)
+        
+        return self.route(code).coupons.create(code, coins, ram, disk, cpu, servers)
+    
+    def revoke_coupon(self, code: str):
+        '''`code` - The code of the coupon to revoke
+        
+        Revokes a coupon on the panel that owns it. Returns `None` on success.
+        '''
+        return self.route(code).coupons.revoke(code)
+    
+    def close(self):
+        '''Closes the clients of every panel.'''
+        for c in self.panels.values():
+            c.close()
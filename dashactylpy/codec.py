@@ -0,0 +1,61 @@
+import json
+from typing import Any
+
+
+__all__ = ('JSONCodec', 'StdlibCodec', 'OrjsonCodec', 'default_codec')
+
+class JSONCodec:
+    '''Encodes request bodies to bytes and decodes response bodies from bytes.'''
+    name = 'base'
+    
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+    
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+    
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__} name={self.name!r}>'
+
+
+class StdlibCodec(JSONCodec):
+    '''The standard library `json` module.'''
+    name = 'json'
+    
+    def __init__(self):
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+        self._decoder = json.JSONDecoder()
+    
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj).encode()
+    
+    def loads(self, data: bytes) -> Any:
+        return self._decoder.decode(data.decode())
+
+
+class OrjsonCodec(JSONCodec):
+    '''The `orjson` library, which reads and writes bytes natively.'''
+    name = 'orjson'
+    
+    def __init__(self):
+        # imported here so the package can be imported without paying for orjson
+        try:
+            import orjson
+        except ImportError:
+            raise RuntimeError('orjson is not installed') from None
+        
+        self._orjson = orjson
+    
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+    
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+def default_codec() -> JSONCodec:
+    '''Returns the fastest installed codec, falling back to the standard library.'''
+    try:
+        return OrjsonCodec()
+    except RuntimeError:
+        return StdlibCodec()
@@ -0,0 +1,194 @@
+from typing import IO, Any, Callable, Dict, Iterable, Tuple
+from .codec import JSONCodec, default_codec
+from .structures import DashServer, DashUser
+
+
+__all__ = ('USER_FIELDS', 'SERVER_FIELDS', 'columns', 'snapshot', 'write_csv', 'write_ndjson')
+
+# fields are read from the structures' packed sections without building their dicts
+Field = Tuple[str, str, Callable[[Any], Any]]
+
+class _Part:
+    '''One value of a tuple that is computed once per row for every field reading from it.'''
+    __slots__ = ('source', 'index')
+    
+    def __init__(self, source: Callable[[Any], tuple], index: int):
+        self.source = source
+        self.index = index
+    
+    def __call__(self, item: Any) -> Any:
+        return self.source(item)[self.index]
+
+
+def _coins(user: DashUser) -> Any:
+    coins = user._coins
+    return coins if coins is None or isinstance(coins, (int, float)) else coins.amount
+
+
+def _server_count(user: DashUser) -> int:
+    servers = user._servers
+    return len(servers) if isinstance(servers, tuple) else len(servers.cache)
+
+
+USER_FIELDS: Tuple[Field, ...] = (
+    ('id', 'int', lambda u: u.id),
+    ('uuid', 'str', lambda u: u.uuid),
+    ('username', 'str', lambda u: u.username),
+    ('email', 'str', lambda u: u.email),
+    ('is_admin', 'bool', lambda u: u.is_admin),
+    ('language', 'str', lambda u: u.language),
+    ('created_at', 'str', lambda u: u.created_at),
+    ('coins', 'float', _coins),
+    ('ram', 'float', _Part(DashUser._totals, 0)),
+    ('disk', 'float', _Part(DashUser._totals, 1)),
+    ('cpu', 'float', _Part(DashUser._totals, 2)),
+    ('servers', 'float', _Part(DashUser._totals, 3)),
+    ('server_count', 'int', _server_count)
+)
+
+SERVER_FIELDS: Tuple[Field, ...] = (
+    ('id', 'int', lambda s: s.id),
+    ('uuid', 'str', lambda s: s.uuid),
+    ('identifier', 'str', lambda s: s.identifier),
+    ('name', 'str', lambda s: s.name),
+    ('user', 'int', lambda s: s.user),
+    ('node', 'int', lambda s: s.node),
+    ('nest', 'int', lambda s: s.nest),
+    ('egg', 'int', lambda s: s.egg),
+    ('is_suspended', 'bool', lambda s: s.is_suspended),
+    ('memory', 'float', _Part(DashServer._footprint, 0)),
+    ('disk', 'float', _Part(DashServer._footprint, 1)),
+    ('cpu', 'float', _Part(DashServer._footprint, 2)),
+    ('created_at', 'str', lambda s: s.created_at)
+)
+
+def _rows(fields: Iterable[Field], items: Iterable[Any]) -> Iterable[tuple]:
+    getters = [get for _, _, get in fields]
+    sources = list(dict.fromkeys(get.source for get in getters if isinstance(get, _Part)))
+    # each field is either a plain getter or the position of its value among the shared tuples
+    plan = [(sources.index(get.source), get.index) if isinstance(get, _Part) else get for get in getters]
+    if not sources:
+        for item in items:
+            yield tuple(get(item) for get in getters)
+        
+        return
+    
+    for item in items:
+        shared = [source(item) for source in sources]
+        yield tuple(shared[p[0]][p[1]] if type(p) is tuple else p(item) for p in plan)
+
+
+def columns(fields: Iterable[Field], items: Iterable[Any]) -> Dict[str, list]:
+    '''`fields` - The fields to export, `USER_FIELDS` or `SERVER_FIELDS`
+    
+    `items` - The users or servers to export
+    
+    Returns a dict of one list per field, in the order of the items.
+    '''
+    fields = tuple(fields)
+    cols = [[] for _ in fields]
+    appends = [c.append for c in cols]
+    for row in _rows(fields, items):
+        for append, v in zip(appends, row):
+            append(v)
+    
+    return {name: c for (name, _, _), c in zip(fields, cols)}
+
+
+def _numpy(fields: Tuple[Field, ...], cols: Dict[str, list]) -> dict:
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError('numpy is not installed') from None
+    
+    arrays = {}
+    for name, kind, _ in fields:
+        c = cols[name]
+        if kind == 'float':
+            # missing numbers become NaN so the column stays numeric
+            arrays[name] = numpy.fromiter((float('nan') if v is None else v for v in c), float, len(c))
+        elif kind == 'int' and None not in c:
+            arrays[name] = numpy.array(c, dtype=numpy.int64)
+        elif kind == 'bool':
+            arrays[name] = numpy.array([bool(v) for v in c], dtype=bool)
+        else:
+            arrays[name] = numpy.array(c, dtype=object)
+    
+    return arrays
+
+
+def _arrow(fields: Tuple[Field, ...], cols: Dict[str, list]):
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError('pyarrow is not installed') from None
+    
+    types = {'int': pyarrow.int64(), 'float': pyarrow.float64(), 'bool': pyarrow.bool_(), 'str': pyarrow.string()}
+    return pyarrow.table({name: pyarrow.array(cols[name], types[kind]) for name, kind, _ in fields})
+
+
+def snapshot(fields: Iterable[Field], items: Iterable[Any], format: str='columns') -> Any:
+    '''`fields` - The fields to export, `USER_FIELDS` or `SERVER_FIELDS`
+    
+    `items` - The users or servers to export
+    
+    `format` - `columns` for a dict of lists, `numpy` for a dict of NumPy arrays or `arrow` for a PyArrow table
+    
+    Exports the items into one column per field. Numeric columns can be summed or binned as a whole.
+    '''
+    if format not in ('columns', 'numpy', 'arrow'):
+        raise ValueError('format must be one of columns, numpy or arrow')
+    
+    fields = tuple(fields)
+    cols = columns(fields, items)
+    if format == 'numpy':
+        return _numpy(fields, cols)
+    
+    if format == 'arrow':
+        return _arrow(fields, cols)
+    
+    return cols
+
+
+def write_csv(fp: IO[str], fields: Iterable[Field], items: Iterable[Any]) -> int:
+    '''`fp` - The text file to write to, opened with `newline=''`
+    
+    `fields` - The fields to export, `USER_FIELDS` or `SERVER_FIELDS`
+    
+    `items` - The users or servers to export
+    
+    Writes a header and one row per item as it goes. Returns the number of rows written.
+    '''
+    import csv
+    
+    fields = tuple(fields)
+    writer = csv.writer(fp)
+    writer.writerow(name for name, _, _ in fields)
+    n = 0
+    for row in _rows(fields, items):
+        writer.writerow(row)
+        n += 1
+    
+    return n
+
+
+def write_ndjson(fp: IO[bytes], fields: Iterable[Field], items: Iterable[Any], codec: JSONCodec=None) -> int:
+    '''`fp` - The binary file to write to
+    
+    `fields` - The fields to export, `USER_FIELDS` or `SERVER_FIELDS`
+    
+    `items` - The users or servers to export
+    
+    `codec` - The JSON codec to encode rows with (defaults to the fastest installed)
+    
+    Writes one JSON object per line per item as it goes. Returns the number of rows written.
+    '''
+    codec = codec or default_codec()
+    fields = tuple(fields)
+    names = [name for name, _, _ in fields]
+    n = 0
+    for row in _rows(fields, items):
+        fp.write(codec.dumps(dict(zip(names, row))) + b'\n')
+        n += 1
+    
+    return n
@@ -1,24 +1,85 @@
-from . import DashServer, DashUser, Coupon
-from typing import Union, Optional, List
+import atexit
+from threading import Event, Lock, Thread
+from .cache import Cache
+from .stream import JSONArrayStream
+from .structures import DashServer, DashUser, Coupon
+from typing import Union, Optional, List, Iterable, Iterator, Tuple
 from types import FunctionType
+from weakref import WeakSet
 
 
 __all__ = (
+    'CoinBuffer',
     'CoinsManager',
     'ResourceManager',
     'DashServerManager',
     'CouponManager',
     'DashUserManager',
-    'DashUserServerManager'
+    'DashUserServerManager',
+    'QuotaExceededError'
 )
 
 MAX_AMOUNT = int('9' * 15)
 
+# coin buffers with changes that may not have been sent, flushed at exit if they were never closed
+_open_buffers = WeakSet()
+
+@atexit.register
+def _close_buffers():
+    for buffer in list(_open_buffers):
+        buffer.close()
+
+
 class DashUserWarning(Exception):
     '''Warning exception for DashUser errors.'''
     pass
 
 
+class QuotaExceededError(Exception):
+    '''Raised when a server would take a user past their resources, before any request is sent.'''
+    def __init__(self, user: int, resource: str, requested: float, remaining: float):
+        super().__init__(f'user {user} has {remaining} {resource} left but {requested} was requested')
+        self.user = user
+        self.resource = resource
+        self.requested = requested
+        self.remaining = remaining
+
+
+def _check_specs(*specs: Optional[float]):
+    # specs left as None are not being set, so there is nothing to check
+    if any(s is not None and 0 < s > MAX_AMOUNT for s in specs):
+        raise ValueError('server specs params must be between 1 and 9 hundred-trillion')
+
+
+_SERVER_SPEC = ('user', 'name', 'ram', 'disk', 'cpu', 'egg', 'location')
+_RESOURCES = ('ram', 'disk', 'cpu', 'servers')
+_TOTALLED = ('user', 'node', 'egg')
+
+def _grouped(server: DashServer) -> tuple:
+    return server.user, server.node, server.egg
+
+
+def _server_request(user: Union[int, DashUser],
+                    name: str,
+                    ram: float,
+                    disk: float,
+                    cpu: float,
+                    egg: str,
+                    location: str) -> tuple:
+    if isinstance(user, DashUser):
+        user = user.id
+    
+    return ('POST',
+            '/api/createserver',
+            {'userid': str(user),
+            'name': name,
+            'ram': str(ram),
+            'disk': str(disk),
+            'cpu': str(cpu),
+            'egg': egg,
+            'location': location})
+
+
 class CoinsManager:
     def __init__(self, client, user: Union[int, DashUser], data: dict):
         '''`client` - The Dashactyl client
@@ -30,27 +91,75 @@ class CoinsManager:
         self.client = client
         self.user = user
         self.amount = data['coins']
+        self._confirmed = self.amount
+        self._pending = None
     
     def __call__(self) -> int:
         '''Returns the number of coins the user has or -1 if unavailable.'''
         return self.amount or -1
     
-    def add(self, amount: int) -> int:
-        '''`amount` - The number of coins to add
+    def _synced(self, amount: int):
+        # the panel's amount becomes the confirmed one, with any buffered change still applied on top
+        buffer = self.client.coin_buffer
+        if buffer is None:
+            self._confirmed = self.amount = amount
+            return
         
-        Adds an amount of coins to the user's account. Returns the added coins on success.
-        '''
-        if 0 < amount:
+        with buffer._lock:
+            self._confirmed = amount
+            self.amount = buffer._apply(amount, self._pending)
+    
+    def _add(self, amount: int) -> tuple:
+        if amount < 1:
             raise ValueError('amount must be greater than 0')
         
         if amount > MAX_AMOUNT:
             amount = MAX_AMOUNT
         
-        res = self.client.request('PATCH', '/api/addcoins', {'id': str(self.user.username), 'coins': amount})
+        return (self.amount + amount,
+                ('PATCH', '/api/addcoins', {'id': str(self.user.username), 'coins': amount}))
+    
+    def _remove(self, amount: int) -> tuple:
+        amount = self.amount - amount
+        if amount < 0:
+            amount = 0
+        
+        if 0 < amount > MAX_AMOUNT:
+            raise ValueError('amount must be between 1 and 9 hundred-trillion')
+        
+        return amount, self._left(amount)
+    
+    def _left(self, amount: int) -> tuple:
+        # removals are sent as the number of coins left
+        return ('POST', '/api/setcoins', {'id': str(self.user.username), 'coins': amount})
+    
+    def _set(self, amount: int) -> tuple:
+        if not self.user:
+            raise DashUserWarning('user not found')
+        
+        user = self.user
+        if isinstance(self.user, DashUser):
+            user = self.user.username
+        
+        if 0 < amount > MAX_AMOUNT:
+            raise ValueError('amount must be between 1 and 9 hundred-trillion')
+        
+        return amount, ('POST', '/api/setcoins', {'id': str(user), 'coins': amount})
+    
+    def add(self, amount: int) -> int:
+        '''`amount` - The number of coins to add
+        
+        Adds an amount of coins to the user's account. Returns the added coins on success.
+        '''
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'add', amount)
+        
+        amount, req = self._add(amount)
+        res = self.client.request(*req)
         if res['status'] != 'success':
             raise Exception(res)
         
-        self.amount += amount
+        self.amount = amount
         return self.amount
     
     def remove(self, amount: int) -> int:
@@ -58,14 +167,11 @@ class CoinsManager:
         
         Removes an amount of coins from the user's account. Returns the removed coins on success.
         '''
-        amount = self.amount - amount
-        if amount < 0:
-            amount = 0
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'remove', amount)
         
-        if 0 < amount > MAX_AMOUNT:
-            raise ValueError('amount must be between 1 and 9 hundred-trillion')
-        
-        res = self.client.request('POST', '/api/setcoins', {'id': str(self.user.username), 'coins': amount})
+        amount, req = self._remove(amount)
+        res = self.client.request(*req)
         if res['status'] != 'success':
             return res
         
@@ -77,17 +183,11 @@ class CoinsManager:
         
         Sets the users coins to the specified amount. Returns the set amount of coins on success.
         '''
-        if not self.user:
-            raise DashUserWarning('user not found')
-        
-        user = self.user
-        if isinstance(self.user, DashUser):
-            user = self.user.username
-        
-        if 0 < amount > MAX_AMOUNT:
-            raise ValueError('amount must be between 1 and 9 hundred-trillion')
+        if self.client.coin_buffer is not None:
+            return self.client.coin_buffer.queue(self, 'set', amount)
         
-        res = self.client.request('POST', '/api/setcoins', {'id': str(user), 'amount': amount})
+        amount, req = self._set(amount)
+        res = self.client.request(*req)
         if res['status'] != 'success':
             return res
         
@@ -95,6 +195,145 @@ class CoinsManager:
         return self.amount
 
 
+class CoinBuffer:
+    '''Merges coin changes per user and sends them as one request each on an interval.'''
+    def __init__(self, client, interval: Optional[float]=1.0):
+        '''`client` - The Dashactyl client
+        
+        `interval` - The number of seconds between flushes, or `None` to only flush when `flush()` is called
+        
+        Creates a new coin buffer. Users' amounts change locally straight away and are
+        rolled back if the request carrying the change fails.
+        
+        Changes are only sent on the interval, by `flush()` or by `close()`, so close the buffer (or the client)
+        before exiting. Changes still pending when the interpreter exits are flushed then as a last resort.
+        '''
+        self.client = client
+        self.interval = interval
+        self.changes = 0
+        self.requests = 0
+        self.failures = 0
+        self._dirty = {}
+        self._lock = Lock()
+        self._flushing = Lock()
+        self._stopped = Event()
+        self._worker = None
+    
+    def __repr__(self) -> str:
+        return f'<CoinBuffer interval={self.interval} pending={len(self._dirty)}>'
+    
+    @staticmethod
+    def _apply(amount: int, pending: Optional[tuple]) -> int:
+        if pending is None:
+            return amount
+        
+        op, value = pending
+        return (amount or 0) + value if op == 'add' else value
+    
+    def queue(self, coins: CoinsManager, op: str, amount: int) -> int:
+        '''`coins` - The coins manager of the user
+        
+        `op` - The change, one of `add`, `remove` or `set`
+        
+        `amount` - The number of coins to change by, or to set
+        
+        Merges a change into the user's pending change. Returns the user's new local amount.
+        '''
+        if op == 'add' and amount < 1:
+            raise ValueError('amount must be greater than 0')
+        
+        if op == 'set' and 0 < amount > MAX_AMOUNT:
+            raise ValueError('amount must be between 1 and 9 hundred-trillion')
+        
+        with self._lock:
+            if op == 'add':
+                kind, value = coins._pending or ('add', 0)
+                coins._pending = (kind, min(MAX_AMOUNT, value + amount))
+            elif op == 'remove':
+                # removals are kept as the amount left and sent like unbuffered removals
+                coins._pending = ('remove', max(0, (coins.amount or 0) - amount))
+            else:
+                coins._pending = ('set', amount)
+            
+            coins.amount = self._apply(coins._confirmed, coins._pending)
+            self._dirty[coins] = None
+            self.changes += 1
+            self._start()
+            return coins.amount
+    
+    def _start(self):
+        # the worker is a daemon thread, so a buffer that is never closed is flushed at exit instead
+        _open_buffers.add(self)
+        if self.interval is not None and self._worker is None:
+            self._worker = Thread(target=self._run, daemon=True)
+            self._worker.start()
+    
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+    
+    def _take(self) -> list:
+        with self._lock:
+            batch = [(coins, coins._pending) for coins in self._dirty]
+            self._dirty.clear()
+            for coins, _ in batch:
+                coins._pending = None
+            
+            return batch
+    
+    def _request(self, coins: CoinsManager, pending: tuple) -> tuple:
+        op, value = pending
+        if op == 'add':
+            return coins._add(value)[1]
+        
+        return coins._left(value) if op == 'remove' else coins._set(value)[1]
+    
+    def _settle(self, coins: CoinsManager, pending: tuple, res: Union[dict, Exception]) -> Optional[tuple]:
+        with self._lock:
+            self.requests += 1
+            ok = isinstance(res, dict) and res['status'] == 'success'
+            if ok:
+                coins._confirmed = self._apply(coins._confirmed, pending)
+            else:
+                self.failures += 1
+            
+            # changes made while the request was in flight stay applied either way
+            coins.amount = self._apply(coins._confirmed, coins._pending)
+        
+        return None if ok else (coins.user, res)
+    
+    def flush(self) -> List[Tuple[Union[int, DashUser], Union[dict, Exception]]]:
+        '''Sends every user's pending change. Returns a list of `(user, failure)` pairs for the
+        changes that failed, where the failure is the failed response or the raised exception.
+        '''
+        failures = []
+        with self._flushing:
+            for coins, pending in self._take():
+                try:
+                    res = self.client.request(*self._request(coins, pending))
+                except Exception as e:
+                    res = e
+                
+                failure = self._settle(coins, pending, res)
+                if failure is not None:
+                    failures.append(failure)
+        
+        return failures
+    
+    def close(self) -> list:
+        '''Stops the flush interval and flushes what is left. Returns the failures like `flush()`.'''
+        self._stopped.set()
+        _open_buffers.discard(self)
+        return self.flush()
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the users with pending changes, changes merged, requests sent and failures.'''
+        return {'pending': len(self._dirty),
+                'changes': self.changes,
+                'requests': self.requests,
+                'failures': self.failures}
+
+
 # TODO: helper methods for resources
 class ResourceManager:
     def __init__(self, client, user: Union[int, DashUser], data: dict):
@@ -129,6 +368,19 @@ class ResourceManager:
             self.cpu += data['extra']['cpu']
             self.servers += data['extra']['servers']
     
+    def _synced(self, data: dict):
+        # applies the package and extra of a newer payload in place
+        self.__patch(data)
+    
+    def used(self) -> dict:
+        '''Returns a dict of the RAM, disk, CPU and servers taken up by the user's cached servers.'''
+        return self.client.servers.usage(self.user)
+    
+    def remaining(self) -> dict:
+        '''Returns a dict of the RAM, disk, CPU and servers the user has left, going by their cached servers.'''
+        used = self.used()
+        return {k: v - used[k] for k, v in self().items()}
+    
     # Functions below this message WONT be implemented until Dashdactyl
     # updates the API methods for the respective endpoints:
     # - add: POST
@@ -171,32 +423,51 @@ class DashUserServerManager:
         '''
         self.client = client
         self.user = user
+        # a user has a handful of servers that live as long as the user does, so a dict by UUID is enough
         self.cache = {}
-        self.__patch(data)
+        self.__patch(*data)
     
     def __patch(self, *data):
         for s in data:
-            if isinstance(s, DashServer):
-                self.cache[s.uuid] = s
-            else:
-                s = DashServer(self.client, s)
-                self.cache[s.uuid] = s
+            if not isinstance(s, DashServer):
+                s = self.client.servers._build(s, self.user)
+            
+            self.cache[s.uuid] = s
+    
+    def _add(self, data: dict) -> DashServer:
+        # the owner's stored payload no longer lists all of its servers
+        self.client._forget('users', self.user.uuid)
+        s = self.client.servers._build(data['data'], self.user)
+        self.cache[s.uuid] = s
+        return s
     
     def find(self, fn: FunctionType) -> Optional[DashServer]:
-        for server in self.cache:
+        for server in self.cache.values():
             if fn(server):
                 return server
         
         return None
     
-    def get(self, id: str) -> Optional[DashServer]:
-        '''`id` - The identifier or UUID of the server
+    def where(self, **attrs) -> List[DashServer]:
+        '''`attrs` - The attribute values to match, such as `egg=3`
+        
+        Gets all of the user's cached servers matching every value.
+        '''
+        return [s for s in self.cache.values() if all(getattr(s, a, None) == v for a, v in attrs.items())]
+    
+    def get(self, id: Union[int, str]) -> Optional[DashServer]:
+        '''`id` - The UUID, identifier or ID of the server
         
         Gets a server from the cache, or fetches directly if not available.
         '''
-        for k in self.cache.keys():
-            if id in k:
-                return self.cache[k]
+        s = self.cache.get(id)
+        if s is not None:
+            return s
+        
+        id = str(id)
+        for s in self.cache.values():
+            if id == s.identifier or id == str(s.id):
+                return s
         
         return None
     
@@ -220,26 +491,26 @@ class DashUserServerManager:
         `location` - The location of the server
         
         Creates a new Pterodactyl server with the specified parameters.
+        Raises `QuotaExceededError` without sending a request if the user's resources would not cover it.
         '''
-        if (0 < ram > MAX_AMOUNT or
-            0 < disk > MAX_AMOUNT or
-            0 < cpu > MAX_AMOUNT):
-            raise ValueError('server specs params must be between 1 and 9 hundred-trillion')
-        
-        data = self.client.request('POST', '/api/createserver',
-                                    {'userid': str(self.user.id),
-                                    'name': name,
-                                    'ram': str(ram),
-                                    'disk': str(disk),
-                                    'cpu': str(cpu),
-                                    'egg': egg,
-                                    'location': location})
+        _check_specs(ram, disk, cpu)
+        self.client.servers._check_quota(self.user, (ram, disk, cpu, 1))
+        data = self.client.request(*_server_request(self.user, name, ram, disk, cpu, egg, location))
         if data['status'] != 'success':
             return data
         
-        s = DashServer(self.client, data['data'])
-        self.cache[s.uuid] = s
-        return s
+        return self._add(data)
+    
+    def create_many(self,
+                    specs: Iterable[dict],
+                    concurrency: int=8) -> List[Tuple[dict, Union[DashServer, dict, Exception]]]:
+        '''`specs` - Dicts of the `name`, `ram`, `disk`, `cpu`, `egg` and `location` of each server
+        
+        `concurrency` - The maximum number of requests in flight (defaults to 8)
+        
+        Creates many servers for the user in parallel. See `DashServerManager.create_many`.
+        '''
+        return self.client.servers.create_many([dict(s, user=self.user) for s in specs], concurrency)
     
     def delete(self, id: str):
         '''`id` - The identifier or UUID of the server
@@ -248,10 +519,7 @@ class DashUserServerManager:
         '''
         s = self.get(id)
         if isinstance(s, DashServer):
-            del self.cache[s.uuid]
-            s.delete()
-            del s
-            return
+            return s.delete()
         
         res = self.client.request('GET', f'/delete?id={id}')
         if res['status'] != 'success':
@@ -262,22 +530,365 @@ class DashUserServerManager:
 
 class DashServerManager:
     def __init__(self, client):
+        '''`client` - The Dashactyl client
+        
+        Creates a new manager for every server known to the client.
+        '''
         self.client = client
-        self.cache = {}
+        self.cache = Cache('uuid', 'identifier', 'id',
+                            groups=('user', 'node', 'egg', 'is_suspended'),
+                            policy=client.cache_policy)
+        self.cache.observe = client.metrics.observer('servers')
+        self.cache.changed = self._account
+        self._totals = {attr: {} for attr in _TOTALLED}
+        self._usage_lock = Lock()
+    
+    def _tally(self, groups: tuple, footprint: tuple, sign: int):
+        for totals, group in zip(self._totals.values(), groups):
+            t = totals.get(group)
+            if t is None:
+                t = totals[group] = [0, 0, 0, 0]
+            
+            for i, v in enumerate(footprint):
+                t[i] += sign * v
+            
+            t[3] += sign
+            if not t[3]:
+                del totals[group]
+    
+    def _account(self, old: Optional[DashServer], new: Optional[DashServer]):
+        # called by the registry whenever a server is cached, replaced, dropped or evicted
+        with self._usage_lock:
+            if old is not None:
+                self._tally(_grouped(old), old._footprint(), -1)
+            
+            if new is not None:
+                self._tally(_grouped(new), new._footprint(), 1)
+    
+    def usage(self, user: Union[int, DashUser]) -> dict:
+        '''`user` - The user or panel ID of the user
+        
+        Returns a dict of the RAM, disk, CPU and number of servers allocated to the user's cached servers.
+        Cached users are counted from their own servers, which stay with them whatever the registry evicts.
+        '''
+        owner = self._owner(user)
+        if owner is None:
+            with self._usage_lock:
+                return dict(zip(_RESOURCES, self._totals['user'].get(user, (0, 0, 0, 0))))
+        
+        servers = owner._servers
+        used = [0, 0, 0, 0]
+        for s in servers if isinstance(servers, tuple) else servers.cache.values():
+            for i, v in enumerate(s._footprint()):
+                used[i] += v
+            
+            used[3] += 1
+        
+        return dict(zip(_RESOURCES, used))
+    
+    def _release(self, user: DashUser):
+        # the registry keeps a user's servers only while the user is cached, so they go with it
+        servers = user._servers
+        for s in servers if isinstance(servers, tuple) else list(servers.cache.values()):
+            if self.cache.peek(s.uuid) is s:
+                self.cache.pop(s.uuid, None)
+    
+    def totals(self, by: str='node') -> dict:
+        '''`by` - The attribute to total by, one of `user`, `node` or `egg` (defaults to `node`)
+        
+        Returns a dict of the RAM, disk, CPU and number of cached servers for each value of the attribute.
+        The totals are kept up to date as servers are cached, so nothing is counted on call.
+        '''
+        if by not in self._totals:
+            raise ValueError(f'servers can only be totalled by {", ".join(_TOTALLED)}')
+        
+        with self._usage_lock:
+            return {k: dict(zip(_RESOURCES, t)) for k, t in self._totals[by].items()}
+    
+    def where(self, **attrs) -> List[DashServer]:
+        '''`attrs` - The attribute values to match, such as `node=3` or `is_suspended=False`
+        
+        Gets all cached servers matching every value. Owners, nodes, eggs and suspension are
+        looked up in the registry's indexes; other attributes are checked on those servers only.
+        '''
+        if isinstance(attrs.get('user'), DashUser):
+            attrs['user'] = attrs['user'].id
+        
+        return self.cache.where(**attrs)
+    
+    def snapshot(self, servers: Iterable[DashServer]=None, format: str='columns'):
+        '''`servers` - The servers to export (defaults to every cached server)
+        
+        `format` - `columns` for a dict of lists, `numpy` for a dict of NumPy arrays or `arrow` for a PyArrow table
+        
+        Exports servers into one column per field of `export.SERVER_FIELDS`, including their limits.
+        '''
+        from .export import SERVER_FIELDS, snapshot
+        return snapshot(SERVER_FIELDS, self.cache.where() if servers is None else servers, format)
+    
+    def dump(self, fp, servers: Iterable[DashServer]=None, format: str='csv') -> int:
+        '''`fp` - The file to write to, a text file for CSV or a binary file for NDJSON
+        
+        `servers` - The servers to export (defaults to every cached server)
+        
+        `format` - `csv` or `ndjson` (defaults to `csv`)
+        
+        Streams servers to a file one row at a time. Returns the number of rows written.
+        '''
+        from .export import SERVER_FIELDS, write_csv, write_ndjson
+        servers = self.cache.where() if servers is None else servers
+        if format == 'csv':
+            return write_csv(fp, SERVER_FIELDS, servers)
+        
+        if format == 'ndjson':
+            return write_ndjson(fp, SERVER_FIELDS, servers, self.client.codec)
+        
+        raise ValueError('format must be csv or ndjson')
+    
+    def _over_quota(self, owner: DashUser, wanted: tuple) -> Optional[QuotaExceededError]:
+        remaining = owner.resources.remaining()
+        for name, v in zip(_RESOURCES, wanted):
+            if v > 0 and v > remaining[name]:
+                return QuotaExceededError(owner.id, name, v, remaining[name])
+        
+        return None
+    
+    def _check_quota(self, user: Union[int, DashUser], wanted: tuple):
+        # users that are not cached have unknown resources, so only the panel can refuse them
+        owner = self._owner(user)
+        if self.client.check_quota and owner is not None:
+            error = self._over_quota(owner, wanted)
+            if error is not None:
+                raise error
+    
+    def _build(self, data: dict, owner: DashUser=None) -> DashServer:
+        s = DashServer(self.client, data)
+        s.owner = owner
+        return self.cache.add(s)
     
     def fetch(self, user: int, id: str):
         # will be implemented soon
         return NotImplemented
     
+    def _check_batch(self, specs: Iterable[dict]) -> list:
+        # every spec is checked before any server is created, so a bad batch creates nothing
+        specs = list(specs)
+        for i, spec in enumerate(specs):
+            missing = [k for k in _SERVER_SPEC if k not in spec]
+            if missing:
+                raise ValueError(f'server spec {i} is missing {", ".join(missing)}')
+            
+            try:
+                _check_specs(spec['ram'], spec['disk'], spec['cpu'])
+            except ValueError as e:
+                raise ValueError(f'server spec {i}: {e}') from None
+        
+        return specs
+    
+    def _owner(self, user: Union[int, DashUser]) -> Optional[DashUser]:
+        if isinstance(user, DashUser):
+            return user
+        
+        return self.client.users.cache.peek(user, 'id')
+    
+    def _plan(self, specs: List[dict]) -> List[Optional[QuotaExceededError]]:
+        # servers earlier in the batch count against the user's resources for the ones after them
+        reserved = {}
+        refused = []
+        for spec in specs:
+            owner = self._owner(spec['user'])
+            error = None
+            if owner is not None:
+                # decoded here rather than racing to do so in the workers
+                owner.servers
+                if self.client.check_quota:
+                    wanted = tuple(a + b for a, b in zip(reserved.get(owner.id, (0, 0, 0, 0)),
+                                                        (spec['ram'], spec['disk'], spec['cpu'], 1)))
+                    error = self._over_quota(owner, wanted)
+                    if error is None:
+                        reserved[owner.id] = wanted
+            
+            refused.append(error)
+        
+        return refused
+    
+    def _provisioned(self, spec: dict, data: dict) -> Union[DashServer, dict]:
+        if data['status'] != 'success':
+            return data
+        
+        owner = self._owner(spec['user'])
+        if owner is None:
+            return self._build(data['data'])
+        
+        return owner.servers._add(data)
+    
+    def _provision(self, spec: dict) -> Union[DashServer, dict, Exception]:
+        try:
+            req = _server_request(*(spec[k] for k in _SERVER_SPEC))
+            return self._provisioned(spec, self.client.request(*req))
+        except Exception as e:
+            return e
+    
+    def create_many(self,
+                    specs: Iterable[dict],
+                    concurrency: int=8) -> List[Tuple[dict, Union[DashServer, dict, Exception]]]:
+        '''`specs` - Dicts of the `user` (a user or user ID), `name`, `ram`, `disk`, `cpu`, `egg` and `location` of each server
+        
+        `concurrency` - The maximum number of requests in flight (defaults to 8)
+        
+        Creates many servers in parallel. All specs are checked before any request is sent.
+        Returns `(spec, server)` pairs in the order of the specs; on failure the server is the
+        failed response or the raised exception, and the rest of the batch carries on.
+        Servers that would take a cached user past their resources get a `QuotaExceededError` and are never sent.
+        '''
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
+        
+        from concurrent.futures import ThreadPoolExecutor
+        
+        specs = self._check_batch(specs)
+        results = self._plan(specs)
+        todo = [i for i, error in enumerate(results) if error is None]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i, server in zip(todo, pool.map(self._provision, (specs[i] for i in todo))):
+                results[i] = server
+        
+        return list(zip(specs, results))
+    
     def get(self, id: str) -> Optional[DashServer]:
-        for k in self.cache.keys():
-            if id in k:
-                return self.cache[k]
+        '''`id` - The identifier, UUID or ID of the server
         
-        return None
+        Gets a server from the client-wide cache.
+        '''
+        return self.cache.lookup(id)
+    
+    def owned_by(self, user: Union[int, DashUser]) -> List[DashServer]:
+        '''`user` - The user or panel ID of the user
+        
+        Gets all cached servers owned by the user.
+        '''
+        if isinstance(user, DashUser):
+            user = user.id
+        
+        return self.cache.group('user', user)
+    
+    def on_node(self, node: int) -> List[DashServer]:
+        '''`node` - The ID of the node
+        
+        Gets all cached servers on the node.
+        '''
+        return self.cache.group('node', node)
+    
+    def with_egg(self, egg: int) -> List[DashServer]:
+        '''`egg` - The ID of the egg
+        
+        Gets all cached servers using the egg.
+        '''
+        return self.cache.group('egg', egg)
     
     def manager_for(user: DashUser) -> DashUserServerManager:
         return user.servers
+    
+    def _sync(self, user: DashUser, payloads: List[dict]) -> Tuple[List[DashServer], List[DashServer]]:
+        # servers are patched in place so references held elsewhere stay current
+        if isinstance(user._servers, tuple):
+            current = {s.uuid: s for s in user._servers}
+        else:
+            current = dict(user._servers.cache)
+        
+        servers, updated = [], []
+        for data in payloads:
+            s = current.pop(data['attributes']['uuid'], None)
+            if s is None:
+                s = self._build(data, user)
+                updated.append(s)
+            else:
+                groups, footprint = _grouped(s), s._footprint()
+                if s._patch(data):
+                    with self._usage_lock:
+                        if self.cache.get(s.uuid) is s:
+                            self._tally(groups, footprint, -1)
+                            self._tally(_grouped(s), s._footprint(), 1)
+                    
+                    # cached again so the node and egg groups follow the server
+                    self.cache.add(s)
+                    updated.append(s)
+            
+            servers.append(s)
+        
+        removed = list(current.values())
+        for s in removed:
+            if self.cache.get(s.uuid) is s:
+                self.cache.pop(s.uuid, None)
+        
+        if isinstance(user._servers, tuple):
+            user._servers = tuple(servers)
+        else:
+            for s in removed:
+                user._servers.cache.pop(s.uuid, None)
+            
+            for s in updated:
+                user._servers.cache[s.uuid] = s
+        
+        return removed, updated
+    
+    def _check_modify(self, server: DashServer, ram: float, disk: float, cpu: float):
+        _check_specs(ram, disk, cpu)
+        footprint = server._footprint()
+        self._check_quota(server.user, tuple(0 if new is None else new - old
+                                            for new, old in zip((ram, disk, cpu), footprint)) + (0,))
+    
+    def _modified(self, server: DashServer, ram: float, disk: float, cpu: float, res: dict):
+        if res['status'] != 'success':
+            return res
+        
+        with self._usage_lock:
+            # the registry only counts its own copy, so a stale duplicate must not move the totals
+            counted = self.cache.get(server.uuid) is server
+            if counted:
+                self._tally(_grouped(server), server._footprint(), -1)
+            
+            limits = server.limits
+            for key, v in (('memory', ram), ('disk', disk), ('cpu', cpu)):
+                if v is not None:
+                    limits[key] = v
+            
+            if counted:
+                self._tally(_grouped(server), server._footprint(), 1)
+        
+        return server
+    
+    @staticmethod
+    def _modify_path(server: DashServer, ram: float, disk: float, cpu: float) -> str:
+        # only the specs being set are sent
+        specs = ''.join(f'&{k}={v}' for k, v in (('ram', ram), ('disk', disk), ('cpu', cpu)) if v is not None)
+        return f'/modify?id={server.id}{specs}'
+    
+    def _modify(self, server: DashServer, ram: float, disk: float, cpu: float):
+        self._check_modify(server, ram, disk, cpu)
+        res = self.client.request('GET', self._modify_path(server, ram, disk, cpu))
+        return self._modified(server, ram, disk, cpu, res)
+    
+    def _delete_path(self, server: DashServer) -> str:
+        return f'/api/deleteserver/{str(server.user)}/{str(server.id)}'
+    
+    def _deleted(self, server: DashServer, res: dict):
+        if res['status'] != 'success':
+            return res
+        
+        self.cache.pop(server.uuid, None)
+        owner = server.get_owner()
+        if owner is not None:
+            self.client._forget('users', owner.uuid)
+            if isinstance(owner._servers, tuple):
+                owner._servers = tuple(s for s in owner._servers if s is not server)
+            else:
+                owner.servers.cache.pop(server.uuid, None)
+        
+        return None
+    
+    def _delete(self, server: DashServer):
+        return self._deleted(server, self.client.request('DELETE', self._delete_path(server)))
 
 
 class CouponManager:
@@ -287,32 +898,122 @@ class CouponManager:
         Creates a new manager for client coupons.
         '''
         self.client = client
-        self.cache = {}
+        self.cache = Cache('code', policy=client.cache_policy)
+        self.cache.revalidate = self._revalidate
+        self.cache.observe = client.metrics.observer('coupons')
     
-    def fetch(self, code: str=None) -> Optional[Union[Coupon, List[Coupon]]]:
-        data = self.client.request('GET', '/api/coupons'+ f'?code={code}' if code is not None else '')
+    def _revalidate(self, coupon: Coupon):
+        def run():
+            try:
+                self.fetch(coupon.code)
+            finally:
+                self.cache.revalidated(coupon.code)
+        
+        self.client._background(run)
+    
+    def _path(self, code: str=None) -> str:
+        return '/api/coupons' + (f'?code={code}' if code is not None else '')
+    
+    def _resolve(self, data: dict, validators: tuple=None) -> Optional[Union[Coupon, List[Coupon]]]:
         if data['status'] != 'success':
             return data
         
         if 'coupon' in data:
-            c = Coupon(data['coupon'])
-            self.cache[c.code] = c
-            return c
+            self.client._persist('coupons', ((data['coupon']['code'], data['coupon'], validators),))
+            return self.cache.add(Coupon(data['coupon']), validators)
         else:
             res = []
             for o in data['coupons']:
-                c = Coupon(o)
-                self.cache[c.code] = c
-                res.append(c)
+                res.append(self.cache.add(Coupon(o)))
             
+            self.client._persist('coupons', ((o['code'], o, None) for o in data['coupons']))
             return res
     
+    def _create(self,
+                code: str,
+                coins: int,
+                ram: float,
+                disk: float,
+                cpu: float,
+                servers: int) -> tuple:
+        if (0 < coins > MAX_AMOUNT or
+            0 < ram > MAX_AMOUNT or
+            0 < disk > MAX_AMOUNT or
+            0 < cpu > MAX_AMOUNT or
+            0 < servers > 10):
+            raise ValueError('amount must be between 1 and 9 hundred-trillion (or servers which is 10)')
+        
+        if not code and not (coins or ram or disk or cpu or servers):
+            raise ValueError('no valid parameters provided')
+        
+        return ('POST',
+                '/api/createcoupon',
+                {'code': code, 'coins': coins, 'ram': ram, 'disk': disk, 'cpu': cpu, 'servers': servers})
+    
+    def _add(self, data: dict) -> Coupon:
+        self.client._persist('coupons', ((data['code'], data, None),))
+        return self.cache.add(Coupon(data))
+    
+    def _restore(self, store):
+        for key, payload, validators, age in store.load('coupons'):
+            self.cache.add(Coupon(self.client.codec.loads(payload)), validators, age)
+    
+    def _validators(self, code: str) -> tuple:
+        cached = self.cache.peek(code)
+        return cached, cached and self.cache.validators(cached.code)
+    
+    def _revalidated(self, cached: Optional[Coupon], data: Optional[dict], validators: tuple) -> Optional[Coupon]:
+        # an unchanged coupon is kept as it is, without parsing anything
+        if data is None:
+            self.cache.refresh(cached.code)
+            self.client._touch('coupons', cached.code)
+            return cached
+        
+        return self._resolve(data, validators)
+    
+    def _fetch(self, code: str) -> Optional[Coupon]:
+        cached, validators = self._validators(code)
+        return self._revalidated(cached, *self.client.conditional(self._path(code), validators))
+    
+    def fetch(self, code: str=None) -> Optional[Union[Coupon, List[Coupon]]]:
+        if code is None:
+            return self._resolve(self.client.request('GET', self._path()))
+        
+        # concurrent fetches of a coupon share the request and the cached coupon it makes
+        if not self.client.coalesce_reads:
+            return self._fetch(code)
+        
+        return self.client._coalesce(('coupons', code), self._fetch, code)
+    
     def get(self, code: str) -> Optional[Coupon]:
-        for k in self.cache.keys():
-            if code == k:
-                return self.cache[k]
+        return self.cache.lookup(code) or self.fetch(code)
+    
+    def _streamed(self, items: list, cache: bool) -> Iterator[Coupon]:
+        if cache:
+            self.client._persist('coupons', ((o['code'], o, None) for o in items))
         
-        return self.fetch(code)
+        for o in items:
+            c = Coupon(o)
+            if cache:
+                self.cache.add(c)
+            
+            yield c
+    
+    def _check_streamed(self, parser: JSONArrayStream):
+        if parser.fields.get('status') != 'success':
+            raise Exception(parser.fields)
+    
+    def iter_coupons(self, cache: bool=False) -> Iterator[Coupon]:
+        '''`cache` - Whether the coupons should be added to the cache (defaults to `False`)
+        
+        Fetches all coupons, yielding them as the response is parsed instead of loading it at once.
+        '''
+        parser = JSONArrayStream('coupons')
+        for chunk in self.client._stream(self._path()):
+            yield from self._streamed(parser.feed(chunk), cache)
+        
+        yield from self._streamed(parser.close(), cache)
+        self._check_streamed(parser)
     
     def create(self,
                 code: str=None,
@@ -335,33 +1036,19 @@ class CouponManager:
         
         Creates a new coupon with the specified parameters.
         '''
-        if (0 < coins > MAX_AMOUNT or
-            0 < ram > MAX_AMOUNT or
-            0 < disk > MAX_AMOUNT or
-            0 < cpu > MAX_AMOUNT or
-            0 < servers > 10):
-            raise ValueError('amount must be between 1 and 9 hundred-trillion (or servers which is 10)')
-        
-        if not code and not (coins or ram or disk or cpu or servers):
-            raise ValueError('no valid parameters provided')
-        
-        data = self.client.request('POST',
-                                    '/api/createcoupon',
-                                    {'code': code, 'coins': coins, 'ram': ram, 'disk': disk, 'cpu': cpu, 'servers': servers})
+        data = self.client.request(*self._create(code, coins, ram, disk, cpu, servers))
         if data['status'] != 'success':
             return data
         
-        c = Coupon(data)
-        self.cache[c.code] = c
-        return c
+        return self._add(data)
     
     def revoke(self, code: str):
         '''`code` - The code of the coupon to revoke
         
         Revokes a specified coupon. Returns `None` on success.
         '''
-        if self.get(code):
-            del self.cache[code]
+        self.cache.pop(code, None)
+        self.client._forget('coupons', code)
         
         # This should be DELETE...
         res = self.client.request('DELETE', f'/api/revokecoupon/{code}')
@@ -378,56 +1065,206 @@ class DashUserManager:
         Creates a new manager for client users.
         '''
         self.client = client
-        self.cache = {}
+        self.cache = Cache('uuid', 'id', 'username', 'email', groups=('is_admin',), policy=client.cache_policy)
+        self.cache.revalidate = self._revalidate
+        self.cache.observe = client.metrics.observer('users')
+        self.cache.changed = self._changed
+    
+    @staticmethod
+    def _key(user: DashUser) -> str:
+        # the panel looks users up by their Discord ID, which is the username rather than the panel ID
+        return user.username
+    
+    @staticmethod
+    def _path(id: Union[int, str]) -> str:
+        return f'/api/userinfo/{id}'
+    
+    def _revalidate(self, user: DashUser):
+        def run():
+            try:
+                self.fetch(self._key(user))
+            finally:
+                self.cache.revalidated(user.uuid)
+        
+        self.client._background(run)
+    
+    def _changed(self, old: Optional[DashUser], new: Optional[DashUser]):
+        # called by the users cache whenever a user is cached, replaced, dropped or evicted
+        if old is not None and old is not new:
+            self.client.servers._release(old)
+        
+        sync = getattr(self.client, 'sync', None)
+        if sync is not None:
+            sync._changed(old, new)
+    
+    def _add(self, data: dict, validators: tuple=None) -> Optional[DashUser]:
+        if data['status'] != 'success':
+            return data
+        
+        user = self.cache.add(DashUser(self.client, data), validators)
+        self.client._persist('users', ((user.uuid, data, validators),))
+        return user
+    
+    def _restore(self, store):
+        for key, payload, validators, age in store.load('users'):
+            self.cache.add(DashUser(self.client, self.client.codec.loads(payload)), validators, age)
+    
+    def _validators(self, id: Union[int, str]) -> tuple:
+        cached = self.cache.peek(id)
+        return cached, cached and self.cache.validators(cached.uuid)
+    
+    def _revalidated(self, cached: Optional[DashUser], data: Optional[dict], validators: tuple) -> Optional[DashUser]:
+        # an unchanged user is kept as it is, without parsing anything
+        if data is None:
+            self.cache.refresh(cached.uuid)
+            self.client._touch('users', cached.uuid)
+            return cached
+        
+        return self._add(data, validators)
+    
+    def _cached(self, id: Union[int, str]) -> Optional[DashUser]:
+        u = self.cache.lookup(id)
+        if u is not None:
+            return u
+        
+        if type(id) == str:
+            raise DashUserWarning('user not found, try with ID instead')
+        
+        return None
+    
+    def _drop(self, user: DashUser, res: dict):
+        if res['status'] != 'success':
+            raise Exception('failed deleting user account')
+        
+        self.cache.pop(user.uuid, None)
+        self.client.servers._release(user)
+        self.client._forget('users', user.uuid)
+        return None
+    
+    def _fetch(self, id: int) -> Optional[DashUser]:
+        cached, validators = self._validators(id)
+        return self._revalidated(cached, *self.client.conditional(self._path(id), validators))
     
     def fetch(self, id: int) -> Optional[DashUser]:
         '''`id` - The ID of the user
         
-        Fetches a user from the API directly.
+        Fetches a user from the API directly. A cached user is revalidated with a conditional request.
+        Concurrent fetches of the same user share one request and return the same user.
         '''
-        data = self.client.request('GET', f'/api/userinfo/{str(id)}')
-        if data['status'] != 'success':
-            return data
+        if not self.client.coalesce_reads:
+            return self._fetch(id)
         
-        u = DashUser(self.client, data)
-        self.cache[u.uuid] = u
-        return u
+        return self.client._coalesce(('users', str(id)), self._fetch, id)
     
     def get(self, id: Union[int, str]) -> Optional[DashUser]:
         '''`id` - The ID of the user
         
         Gets a user from the cache, or fetches directly if unavailable.
         '''
-        for k in self.cache.keys():
-            if id in k:
-                return self.cache[k]
+        return self._cached(id) or self.fetch(id)
+    
+    def _fetch_one(self, id: int) -> Union[DashUser, dict, Exception]:
+        try:
+            return self.fetch(id)
+        except Exception as e:
+            return e
+    
+    def fetch_many(self,
+                    ids: Iterable[int],
+                    concurrency: int=8) -> Iterator[Tuple[int, Union[DashUser, dict, Exception]]]:
+        '''`ids` - The IDs of the users
         
-        if type(id) == str:
-            raise DashUserWarning('user not found, try with ID instead')
+        `concurrency` - The maximum number of requests in flight (defaults to 8)
+        
+        Fetches many users in parallel, skipping users that are already cached.
+        Yields `(id, user)` pairs as they complete; on failure the user is the failed
+        response or the raised exception, and the rest of the batch carries on.
+        '''
+        if concurrency < 1:
+            raise ValueError('concurrency must be greater than 0')
         
-        return self.fetch(id)
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+        
+        pending = {}
+        ids = iter(dict.fromkeys(ids))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                for id in ids:
+                    u = self.cache.lookup(id)
+                    if u is not None:
+                        yield id, u
+                        continue
+                    
+                    pending[pool.submit(self._fetch_one, id)] = id
+                    if len(pending) >= concurrency:
+                        break
+                
+                if not pending:
+                    return
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield pending.pop(f), f.result()
     
     def find(self, fn: FunctionType) -> Optional[DashUser]:
-        for user in self.cache:
+        for user in self.cache.values():
             if fn(user):
                 return user
         
         return None
     
+    def where(self, **attrs) -> List[DashUser]:
+        '''`attrs` - The attribute values to match, such as `is_admin=True`
+        
+        Gets all cached users matching every value. Admin status and the unique
+        attributes are looked up in the cache's indexes; others are checked one by one.
+        '''
+        return self.cache.where(**attrs)
+    
+    def count(self, by: str='is_admin') -> dict:
+        '''`by` - The grouped attribute to count by (defaults to `is_admin`)
+        
+        Returns a dict of the number of cached users for each value of the attribute.
+        '''
+        return self.cache.count(by)
+    
+    def snapshot(self, users: Iterable[DashUser]=None, format: str='columns'):
+        '''`users` - The users to export (defaults to every cached user)
+        
+        `format` - `columns` for a dict of lists, `numpy` for a dict of NumPy arrays or `arrow` for a PyArrow table
+        
+        Exports users into one column per field of `export.USER_FIELDS`, including their coins and resource totals.
+        '''
+        from .export import USER_FIELDS, snapshot
+        return snapshot(USER_FIELDS, self.cache.where() if users is None else users, format)
+    
+    def dump(self, fp, users: Iterable[DashUser]=None, format: str='csv') -> int:
+        '''`fp` - The file to write to, a text file for CSV or a binary file for NDJSON
+        
+        `users` - The users to export (defaults to every cached user)
+        
+        `format` - `csv` or `ndjson` (defaults to `csv`)
+        
+        Streams users to a file one row at a time. Returns the number of rows written.
+        '''
+        from .export import USER_FIELDS, write_csv, write_ndjson
+        users = self.cache.where() if users is None else users
+        if format == 'csv':
+            return write_csv(fp, USER_FIELDS, users)
+        
+        if format == 'ndjson':
+            return write_ndjson(fp, USER_FIELDS, users, self.client.codec)
+        
+        raise ValueError('format must be csv or ndjson')
+    
     def remove(self, user: Union[int, str, DashUser]):
         '''`id` - The ID of the user
         
         Removes (or deletes) the specified user's account. Returns `None` on success.
         '''
-        if isinstance(user, DashUser):
-            del self.cache[user.uuid]
-            user.remove()
-            return
-        
-        u = self.get(user)
-        if u:
-            del self.cache[u.uuid]
-            u.remove()
-            return
+        if not isinstance(user, DashUser):
+            user = self.get(user)
+            if not isinstance(user, DashUser):
+                raise DashUserWarning('user not found')
         
-        raise DashUserWarning('user not found')
+        return self._drop(user, self.client.request('DELETE', f'/api/removeaccount/{str(user.id)}'))
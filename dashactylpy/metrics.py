@@ -0,0 +1,171 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, List, Optional
+
+
+__all__ = ('Histogram', 'Metrics')
+
+def _endpoint(method: str, path: str) -> str:
+    # segments after /api/<name> are IDs and codes, which would give every user their own endpoint
+    parts = path.split('?', 1)[0].split('/')
+    return method + ' ' + '/'.join(parts[:3] + ['{}'] * len(parts[3:]))
+
+
+class Histogram:
+    '''Counts observations into fixed, exponentially sized buckets.'''
+    BOUNDS = tuple(0.0001 * 2 ** i for i in range(20))
+    
+    def __init__(self, bounds: tuple=BOUNDS):
+        '''`bounds` - The upper bounds of the buckets, in ascending order (defaults to 0.1ms up to about 52s)
+        
+        Creates a new empty histogram. Values above the last bound go into an overflow bucket.
+        '''
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+    
+    def __repr__(self) -> str:
+        return f'<Histogram count={self.count} p50={self.quantile(0.5)}>'
+    
+    def observe(self, value: float):
+        '''`value` - The value to record'''
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        
+        if self.max is None or value > self.max:
+            self.max = value
+    
+    def quantile(self, q: float) -> Optional[float]:
+        '''`q` - The quantile, between 0 and 1
+        
+        Returns the upper bound of the bucket the quantile falls in, or `None` if nothing was recorded.
+        '''
+        if not self.count:
+            return None
+        
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(bound, self.max)
+        
+        return self.max
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the count, sum, min, max, p50, p90 and p99, and the non-empty buckets.'''
+        return {'count': self.count,
+                'sum': self.sum,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.quantile(0.5),
+                'p90': self.quantile(0.9),
+                'p99': self.quantile(0.99),
+                'buckets': {b: n for b, n in zip(self.bounds + (float('inf'),), self.counts) if n}}
+
+
+class _Endpoint:
+    __slots__ = ('requests', 'errors', 'statuses', 'sent', 'received', 'latency')
+    
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.sent = 0
+        self.received = 0
+        self.latency = Histogram()
+    
+    def stats(self) -> dict:
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'statuses': dict(self.statuses),
+                'bytes_sent': self.sent,
+                'bytes_received': self.received,
+                'latency': self.latency.stats()}
+
+
+class Metrics:
+    '''Per-endpoint request counters, latency histograms and byte counts, with hooks for exporting them.'''
+    def __init__(self):
+        '''Creates an empty set of metrics. Hooks are added by appending to the hook lists:
+        
+        `before_request` - Called with `(method, path)` before every HTTP request, including retries
+        
+        `after_request` - Called with `(method, path, status, latency, sent, received)` after every HTTP request,
+        where `status` is `None` if the request raised and `latency` is in seconds
+        
+        `cache_events` - Called with `(cache, hit)` on every cache lookup, where `cache` is the manager's name
+        '''
+        self.before_request: List[Callable] = []
+        self.after_request: List[Callable] = []
+        self.cache_events: List[Callable] = []
+        self.endpoints = {}
+        self.caches = {}
+        self._lock = Lock()
+    
+    def __repr__(self) -> str:
+        return f'<Metrics endpoints={len(self.endpoints)}>'
+    
+    def _before(self, method: str, path: str):
+        for hook in self.before_request:
+            hook(method, path)
+    
+    def _after(self, method: str, path: str, status: Optional[int], latency: float, sent: int, received: int):
+        key = _endpoint(method, path)
+        with self._lock:
+            e = self.endpoints.get(key)
+            if e is None:
+                e = self.endpoints[key] = _Endpoint()
+            
+            e.requests += 1
+            e.errors += status is None or status >= 400
+            e.statuses[status] = e.statuses.get(status, 0) + 1
+            e.sent += sent
+            e.received += received
+            e.latency.observe(latency)
+        
+        for hook in self.after_request:
+            hook(method, path, status, latency, sent, received)
+    
+    def _received(self, method: str, path: str, size: int):
+        # streamed bodies are counted as they are read, after the request has been recorded
+        with self._lock:
+            e = self.endpoints.get(_endpoint(method, path))
+            if e is not None:
+                e.received += size
+    
+    def _cache(self, name: str, hit: bool):
+        with self._lock:
+            counts = self.caches.get(name)
+            if counts is None:
+                counts = self.caches[name] = {'hits': 0, 'misses': 0}
+            
+            counts['hits' if hit else 'misses'] += 1
+        
+        for hook in self.cache_events:
+            hook(name, hit)
+    
+    def observer(self, name: str) -> Callable[[bool], None]:
+        '''`name` - The name to record the cache's events under
+        
+        Returns a function for a cache to report its hits and misses to.
+        '''
+        return lambda hit: self._cache(name, hit)
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the stats of every endpoint and the hits and misses of every cache.'''
+        with self._lock:
+            return {'endpoints': {k: e.stats() for k, e in self.endpoints.items()},
+                    'caches': {k: dict(v) for k, v in self.caches.items()}}
+    
+    def reset(self):
+        '''Clears all recorded metrics. Hooks are kept.'''
+        with self._lock:
+            self.endpoints.clear()
+            self.caches.clear()
@@ -0,0 +1,212 @@
+import asyncio
+from collections import deque
+from email.utils import parsedate_to_datetime
+from threading import Condition, Lock
+from time import monotonic, time
+from typing import Mapping, Optional
+
+
+__all__ = ('RateLimiter',)
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    '''A token bucket that queues requests fairly and adapts its concurrency to the panel.'''
+    def __init__(self,
+                rate: float=None,
+                burst: int=None,
+                max_concurrency: int=None,
+                min_concurrency: int=1,
+                target_latency: float=None,
+                retries: int=3):
+        '''`rate` - The number of requests allowed per second (unlimited if not set)
+        
+        `burst` - The number of requests that can be sent at once before `rate` applies
+        
+        `max_concurrency` - The highest number of requests allowed in flight (unlimited if not set)
+        
+        `min_concurrency` - The lowest the concurrency limit can be lowered to (defaults to 1)
+        
+        `target_latency` - The number of seconds above which responses lower the concurrency limit
+        
+        `retries` - The number of times a request answered with 429 is sent again (defaults to 3)
+        
+        Creates a new rate limiter. Requests are let through in the order they arrive.
+        The concurrency limit is halved on 429 responses and slowly raised on fast successful ones.
+        '''
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be greater than 0')
+        
+        if max_concurrency is not None and max_concurrency < min_concurrency:
+            raise ValueError('max_concurrency must not be less than min_concurrency')
+        
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min_concurrency)
+        self.target_latency = target_latency
+        self.retries = retries
+        
+        self.limit = float(max_concurrency) if max_concurrency else None
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.throttled = 0
+        self.paused_until = 0.0
+        self._updated = monotonic()
+        self._queue = deque()
+        self._wakers = {}
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+    
+    def __repr__(self) -> str:
+        return (f'<RateLimiter rate={self.rate} limit={self.limit} '
+                f'in_flight={self.in_flight} queued={len(self._queue)}>')
+    
+    def __delay(self, now: float) -> Optional[float]:
+        if now < self.paused_until:
+            return self.paused_until - now
+        
+        if self.limit is not None and self.in_flight >= int(self.limit):
+            return None
+        
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+        
+        return 0
+    
+    def __ready(self, waiter: object) -> Optional[float]:
+        # only the head of the queue may take a slot, which keeps the queue fair
+        if self._queue[0] is not waiter:
+            return None
+        
+        delay = self.__delay(monotonic())
+        if delay == 0:
+            self._queue.popleft()
+            if self.rate:
+                self.tokens -= 1
+            
+            self.in_flight += 1
+            self.__wake()
+        
+        return delay
+    
+    def __wake(self):
+        self._cond.notify_all()
+        for event, loop in self._wakers.items():
+            loop.call_soon_threadsafe(event.set)
+    
+    def __leave(self, waiter: object):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            self.__wake()
+    
+    def acquire(self):
+        '''Blocks until a request may be sent.'''
+        waiter = object()
+        with self._cond:
+            self._queue.append(waiter)
+            try:
+                while True:
+                    delay = self.__ready(waiter)
+                    if delay == 0:
+                        return
+                    
+                    self._cond.wait(delay)
+            except BaseException:
+                self.__leave(waiter)
+                raise
+    
+    async def acquire_async(self):
+        '''Waits until a request may be sent, without blocking the event loop.'''
+        loop = asyncio.get_running_loop()
+        waiter = asyncio.Event()
+        with self._lock:
+            self._queue.append(waiter)
+        
+        try:
+            while True:
+                with self._lock:
+                    delay = self.__ready(waiter)
+                    if delay == 0:
+                        return
+                    
+                    waiter.clear()
+                    self._wakers[waiter] = loop
+                
+                try:
+                    await asyncio.wait_for(waiter.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self.__leave(waiter)
+            raise
+        finally:
+            with self._lock:
+                self._wakers.pop(waiter, None)
+    
+    def release(self, status: Optional[int], headers: Mapping[str, str], latency: float):
+        '''`status` - The status code of the response, or `None` if the request failed
+        
+        `headers` - The headers of the response
+        
+        `latency` - The number of seconds the request took
+        
+        Frees the request's slot and adapts the limiter to the response.
+        '''
+        with self._lock:
+            self.in_flight -= 1
+            now = monotonic()
+            pause = None
+            if status == 429:
+                self.throttled += 1
+                pause = _seconds(headers.get('Retry-After'))
+                if pause is None:
+                    pause = 1.0
+                
+                if self.limit is not None:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                remaining = headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining'))
+                if remaining is not None and remaining.strip() == '0':
+                    reset = headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset'))
+                    pause = _seconds(reset)
+                    # some panels send the reset as a unix timestamp rather than a delay
+                    if pause is not None and pause > 1e9:
+                        pause = max(0.0, pause - time())
+                
+                if self.limit is not None and status is not None:
+                    if self.target_latency and latency > self.target_latency:
+                        self.limit = max(self.min_concurrency, self.limit * 0.9)
+                    elif status < 500:
+                        # a panel answering with server errors has no room to spare, however fast it answers
+                        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+            
+            self.__wake()
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the limiter's current limit, requests in flight, queued and throttled.'''
+        return {'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queued': len(self._queue),
+                'throttled': self.throttled,
+                'paused': max(0.0, self.paused_until - monotonic())}
@@ -0,0 +1,156 @@
+from random import uniform
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+
+__all__ = ('RetryPolicy', 'CircuitBreaker', 'CircuitOpenError')
+
+class CircuitOpenError(Exception):
+    '''Raised when a request is refused because the panel's circuit is open.'''
+    pass
+
+
+class RetryPolicy:
+    '''Retries failed idempotent requests with jittered exponential backoff.'''
+    def __init__(self,
+                retries: int=3,
+                backoff: float=0.1,
+                max_backoff: float=5.0,
+                methods: tuple=('GET', 'DELETE'),
+                statuses: tuple=(500, 502, 503, 504),
+                unsafe_paths: tuple=('/modify', '/delete')):
+        '''`retries` - The number of times a request is retried (defaults to 3)
+        
+        `backoff` - The base number of seconds to wait before retrying (defaults to 0.1)
+        
+        `max_backoff` - The most seconds to wait between attempts (defaults to 5)
+        
+        `methods` - The HTTP methods that are safe to retry (defaults to GET and DELETE)
+        
+        `statuses` - The response codes that are retried (defaults to 500, 502, 503 and 504)
+        
+        `unsafe_paths` - The paths that change the panel through one of the methods, which are never retried
+        (defaults to `/modify` and `/delete`, which the panel serves over GET)
+        
+        Creates a new retry policy. Connection errors are always retried for the methods.
+        '''
+        if retries < 0:
+            raise ValueError('retries must not be negative')
+        
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.methods = methods
+        self.statuses = statuses
+        self.unsafe_paths = unsafe_paths
+        self.attempts = 0
+    
+    def __repr__(self) -> str:
+        return f'<RetryPolicy retries={self.retries} methods={self.methods}>'
+    
+    def retryable(self, method: str, attempt: int, status: Optional[int]=None, path: str=None) -> bool:
+        '''`method` - The HTTP method of the request
+        
+        `attempt` - The number of retries already made
+        
+        `status` - The response code, or `None` if the request raised a connection error
+        
+        `path` - The path of the request, if known
+        
+        Returns whether the request should be sent again.
+        '''
+        if attempt >= self.retries or method not in self.methods:
+            return False
+        
+        # a retried mutation may fail after the first attempt already went through
+        if path is not None and path.partition('?')[0] in self.unsafe_paths:
+            return False
+        
+        return status is None or status in self.statuses
+    
+    def delay(self, attempt: int) -> float:
+        '''`attempt` - The number of retries already made
+        
+        Returns a random number of seconds to wait, up to the exponential backoff for the attempt.
+        '''
+        self.attempts += 1
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker:
+    '''Fails requests fast after repeated failures until the panel has had time to recover.'''
+    def __init__(self, threshold: int=5, reset_timeout: float=30.0):
+        '''`threshold` - The number of consecutive failures that open the circuit (defaults to 5)
+        
+        `reset_timeout` - The number of seconds the circuit stays open before a trial request (defaults to 30)
+        
+        Creates a new circuit breaker. Connection errors and 5xx responses count as failures.
+        '''
+        if threshold < 1:
+            raise ValueError('threshold must be greater than 0')
+        
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = Lock()
+    
+    def __repr__(self) -> str:
+        return f'<CircuitBreaker state={self.state!r} failures={self.failures}>'
+    
+    @property
+    def state(self) -> str:
+        '''The state of the circuit, one of `closed`, `open` or `half_open`.'''
+        if self._opened_at is None:
+            return 'closed'
+        
+        if monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        
+        return 'half_open'
+    
+    def allow(self) -> bool:
+        '''Returns whether a request may be sent. Only one trial request is let through when half open.'''
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            
+            return False
+    
+    def success(self):
+        '''Records a successful request, closing the circuit.'''
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+    
+    def failure(self):
+        '''Records a failed request, opening the circuit if the threshold is reached.'''
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    self.trips += 1
+                
+                self._opened_at = monotonic()
+                self._probing = False
+    
+    def release(self):
+        '''Gives up a request that ended without an outcome, such as a cancelled one,
+        so the next request can be the trial when half open.'''
+        with self._lock:
+            self._probing = False
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the breaker's state, consecutive failures and times tripped.'''
+        return {'state': self.state,
+                'failures': self.failures,
+                'trips': self.trips}
@@ -0,0 +1,119 @@
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Iterable, List, Optional, Tuple
+
+
+__all__ = ('SQLiteStore',)
+
+_SCHEMA = '''CREATE TABLE IF NOT EXISTS payloads (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    etag TEXT,
+    modified TEXT,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID'''
+
+_UPSERT = '''INSERT INTO payloads VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (kind, key) DO UPDATE SET
+    payload = excluded.payload,
+    etag = excluded.etag,
+    modified = excluded.modified,
+    stored_at = excluded.stored_at'''
+
+class SQLiteStore:
+    '''A SQLite file of raw panel payloads that the managers' caches are restored from on start.'''
+    def __init__(self, path: str, timeout: float=5.0):
+        '''`path` - The path of the database file
+        
+        `timeout` - The number of seconds to wait for another process to finish writing (defaults to 5)
+        
+        Opens (or creates) a store. Several processes can share the same file.
+        '''
+        self.path = path
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            # write-ahead logging lets readers in other processes carry on while one process writes
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(_SCHEMA)
+    
+    def __repr__(self) -> str:
+        return f'<SQLiteStore path={self.path!r}>'
+    
+    def put(self, kind: str, entries: Iterable[Tuple[str, bytes, Optional[tuple]]]):
+        '''`kind` - The kind of payload, such as `users` or `coupons`
+        
+        `entries` - The `(key, payload, validators)` entries to store
+        
+        Stores payloads with the current time, replacing any stored under the same keys.
+        '''
+        now = time()
+        rows = [(kind, key, payload, *(validators or (None, None)), now)
+                for key, payload, validators in entries]
+        if not rows:
+            return
+        
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.executemany(_UPSERT, rows)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            
+            self._db.execute('COMMIT')
+    
+    def touch(self, kind: str, key: str):
+        '''`kind` - The kind of payload
+        
+        `key` - The key of the payload
+        
+        Marks a stored payload as fresh, as when the panel reports it unchanged.
+        '''
+        with self._lock:
+            self._db.execute('UPDATE payloads SET stored_at = ? WHERE kind = ? AND key = ?',
+                            (time(), kind, key))
+    
+    def delete(self, kind: str, key: str):
+        '''`kind` - The kind of payload
+        
+        `key` - The key of the payload
+        
+        Removes a stored payload.
+        '''
+        with self._lock:
+            self._db.execute('DELETE FROM payloads WHERE kind = ? AND key = ?', (kind, key))
+    
+    def load(self, kind: str) -> List[Tuple[str, bytes, Optional[tuple], float]]:
+        '''`kind` - The kind of payload
+        
+        Returns a list of `(key, payload, validators, age)` for every stored payload of the kind,
+        where `age` is the number of seconds since it was stored.
+        '''
+        with self._lock:
+            rows = self._db.execute('SELECT key, payload, etag, modified, stored_at '
+                                    'FROM payloads WHERE kind = ?', (kind,)).fetchall()
+        
+        now = time()
+        return [(key, payload, (etag, modified) if etag or modified else None, max(0.0, now - stored_at))
+                for key, payload, etag, modified, stored_at in rows]
+    
+    def clear(self, kind: str=None):
+        '''`kind` - The kind of payload to remove, or all payloads if not set
+        
+        Removes stored payloads.
+        '''
+        with self._lock:
+            if kind is None:
+                self._db.execute('DELETE FROM payloads')
+            else:
+                self._db.execute('DELETE FROM payloads WHERE kind = ?', (kind,))
+    
+    def close(self):
+        '''Closes the database file.'''
+        with self._lock:
+            self._db.close()
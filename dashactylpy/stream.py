@@ -0,0 +1,141 @@
+from codecs import getincrementaldecoder
+from json import JSONDecoder, JSONDecodeError
+from typing import Any, List
+
+
+__all__ = ('JSONArrayStream',)
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]}'
+
+class JSONArrayStream:
+    '''Incrementally parses a JSON object, yielding the items of one of its arrays as they arrive.'''
+    def __init__(self, key: str):
+        '''`key` - The key of the array to yield items from
+        
+        Creates a new parser. The object's other top-level fields are collected into `fields`.
+        '''
+        self.key = key
+        self.fields = {}
+        self._buf = ''
+        self._pos = 0
+        self._state = 'start'
+        self._field = None
+        self._text = getincrementaldecoder('utf-8')()
+        self._json = JSONDecoder()
+    
+    def __value(self, final: bool) -> tuple:
+        buf, pos = self._buf, self._pos
+        try:
+            value, end = self._json.raw_decode(buf, pos)
+        except JSONDecodeError:
+            if final:
+                raise
+            
+            return False, None
+        
+        # numbers and literals are only complete once a delimiter follows them
+        if not final and buf[pos] not in '{["' and (end == len(buf) or buf[end] not in _DELIMITERS):
+            return False, None
+        
+        self._pos = end
+        return True, value
+    
+    def feed(self, chunk: bytes, final: bool=False) -> List[Any]:
+        '''`chunk` - The next bytes of the body
+        
+        `final` - Whether this is the last chunk
+        
+        Parses as much of the body as possible and returns the array items completed by the chunk.
+        '''
+        self._buf = self._buf[self._pos:] + self._text.decode(chunk, final)
+        self._pos = 0
+        items = []
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            
+            self._pos = pos
+            if pos >= len(buf):
+                break
+            
+            c = buf[pos]
+            state = self._state
+            if state == 'start':
+                if c != '{':
+                    raise ValueError(f'expected an object, got {c!r}')
+                
+                self._pos += 1
+                self._state = 'key'
+            elif state in ('key', 'next_key'):
+                if c == '}':
+                    self._pos += 1
+                    self._state = 'end'
+                    continue
+                
+                if state == 'next_key':
+                    if c != ',':
+                        raise ValueError(f'expected , or }}, got {c!r}')
+                    
+                    self._pos += 1
+                    self._state = 'key'
+                    continue
+                
+                ok, self._field = self.__value(final)
+                if not ok:
+                    break
+                
+                self._state = 'colon'
+            elif state == 'colon':
+                if c != ':':
+                    raise ValueError(f'expected :, got {c!r}')
+                
+                self._pos += 1
+                self._state = 'open' if self._field == self.key else 'value'
+            elif state == 'open':
+                if c != '[':
+                    raise ValueError(f'expected an array for {self.key!r}, got {c!r}')
+                
+                self._pos += 1
+                self._state = 'item'
+            elif state in ('item', 'next_item'):
+                if c == ']':
+                    self._pos += 1
+                    self._state = 'next_key'
+                    continue
+                
+                if state == 'next_item':
+                    if c != ',':
+                        raise ValueError(f'expected , or ], got {c!r}')
+                    
+                    self._pos += 1
+                    self._state = 'item'
+                    continue
+                
+                ok, item = self.__value(final)
+                if not ok:
+                    break
+                
+                items.append(item)
+                self._state = 'next_item'
+            elif state == 'value':
+                ok, value = self.__value(final)
+                if not ok:
+                    break
+                
+                self.fields[self._field] = value
+                self._state = 'next_key'
+            else:
+                raise ValueError(f'unexpected data after the object: {c!r}')
+        
+        return items
+    
+    def close(self) -> List[Any]:
+        '''Parses the rest of the body and returns its remaining items. Raises if the body is incomplete.'''
+        items = self.feed(b'', True)
+        if self._state != 'end':
+            raise ValueError('the response body ended before the object was complete')
+        
+        return items
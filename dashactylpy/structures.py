@@ -1,12 +1,57 @@
 # Dashdactyl.py Class Structures
-from . import MAX_AMOUNT, CoinsManager, ResourceManager, DashUserServerManager
-from typing import Optional
+from sys import intern
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from .managers import CoinsManager, DashUserServerManager, ResourceManager
 
 
 __all__ = ('DashUser', 'DashServer', 'Coupon')
 
+_shared = {}
+
+def _intern(value: Any) -> Any:
+    # values like languages, nodes and eggs repeat across thousands of structures
+    if value is None:
+        return None
+    
+    if isinstance(value, str):
+        return intern(value)
+    
+    return _shared.setdefault((type(value), value), value)
+
+
+def _pack(section: Optional[dict]) -> Optional[tuple]:
+    # stores a section as a shared key tuple and a value tuple until it is needed
+    if not section:
+        return None
+    
+    keys = tuple(section)
+    return _shared.setdefault(keys, keys), tuple(section.values())
+
+
+def _unpack(section: Optional[tuple]) -> Optional[dict]:
+    if section is None:
+        return {}
+    
+    return dict(zip(*section))
+
+
+def _get(section: Optional[tuple], key: str) -> Any:
+    # reads one value from a packed section without building its dict
+    if section is None:
+        return None
+    
+    keys, values = section
+    return values[keys.index(key)] if key in keys else None
+
+
 class DashUser:
     '''Represents a Dashactyl-Pterodactyl User.'''
+    __slots__ = ('client', 'id', 'uuid', 'is_admin', 'email', 'username',
+                'firstname', 'lastname', 'language', 'tfa', 'created_at',
+                'updated_at', '_coins', '_servers', '_resources')
+    
     def __init__(self, client, data: dict):
         att = data['userinfo']['attributes']
         self.client = client
@@ -19,15 +64,98 @@ class DashUser:
         self.firstname: str = att['first_name']
         self.lastname: str = att['last_name']
         
-        self.language: str = att['language']
+        self.language: str = _intern(att['language'])
         self.tfa: bool = att['2fa'] or False
         
         self.created_at: str = att['created_at']
         self.updated_at: str = att['updated_at'] or None
         
-        self.coins = CoinsManager(client, self, data)
-        self.servers = DashUserServerManager(client, self, att)
-        self.resources = ResourceManager(self, data)
+        servers = att.get('relationships', {}).get('servers', {}).get('data', [])
+        # sections are kept undecoded until their manager is first accessed
+        self._coins = data['coins']
+        self._servers = tuple(client.servers._build(s, self) for s in servers)
+        self._resources = (_pack(data['package']), _pack(data['extra']))
+    
+    # sections are decoded by the client's manager classes, so this module never imports the managers
+    @property
+    def coins(self) -> 'CoinsManager':
+        if self._coins is None or isinstance(self._coins, (int, float)):
+            self._coins = self.client._coins_cls(self.client, self, {'coins': self._coins})
+        
+        return self._coins
+    
+    @property
+    def servers(self) -> 'DashUserServerManager':
+        if isinstance(self._servers, tuple):
+            self._servers = self.client._user_servers_cls(self.client, self, *self._servers)
+        
+        return self._servers
+    
+    @property
+    def resources(self) -> 'ResourceManager':
+        if isinstance(self._resources, tuple):
+            package, extra = self._resources
+            self._resources = self.client._resources_cls(self.client, self,
+                                                        {'package': _unpack(package),
+                                                        'extra': _unpack(extra)})
+        
+        return self._resources
+    
+    def _totals(self) -> tuple:
+        # the RAM, disk, CPU and servers of the package and extra, read without decoding them
+        if not isinstance(self._resources, tuple):
+            r = self._resources
+            return r.ram, r.disk, r.cpu, r.servers
+        
+        package, extra = self._resources
+        return tuple((_get(package, k) or 0) + (_get(extra, k) or 0) for k in ('ram', 'disk', 'cpu', 'servers'))
+    
+    def _patch(self, data: dict) -> dict:
+        # applies a newer payload in place and returns the fields that changed as (old, new) pairs
+        att = data['userinfo']['attributes']
+        changes = {}
+        for name, value in (('is_admin', att['root_admin']),
+                            ('email', att['email']),
+                            ('username', att['username']),
+                            ('firstname', att['first_name']),
+                            ('lastname', att['last_name']),
+                            ('language', _intern(att['language'])),
+                            ('tfa', att['2fa'] or False),
+                            ('updated_at', att['updated_at'] or None)):
+            old = getattr(self, name)
+            if old != value:
+                setattr(self, name, value)
+                changes[name] = (old, value)
+        
+        coins = self._coins
+        if coins is None or isinstance(coins, (int, float)):
+            if coins != data['coins']:
+                self._coins = data['coins']
+                changes['coins'] = (coins, data['coins'])
+        else:
+            old = coins.amount
+            coins._synced(data['coins'])
+            if coins.amount != old:
+                changes['coins'] = (old, coins.amount)
+        
+        old = self._totals()
+        if isinstance(self._resources, tuple):
+            self._resources = (_pack(data['package']), _pack(data['extra']))
+        else:
+            # a decoded manager is updated rather than replaced, as it may be held elsewhere
+            self._resources._synced(data)
+        
+        new = self._totals()
+        if new != old:
+            keys = ('ram', 'disk', 'cpu', 'servers')
+            changes['resources'] = (dict(zip(keys, old)), dict(zip(keys, new)))
+        
+        servers = att.get('relationships', {}).get('servers', {}).get('data', [])
+        removed, updated = self.client.servers._sync(self, servers)
+        if removed or updated:
+            changes['servers'] = (removed, updated)
+        
+        return changes
     
     @property
     def tag(self) -> str:
@@ -35,17 +163,17 @@ class DashUser:
     
     def remove(self):
         '''Removes (or deletes) the user's account. Returns `None` on success.'''
-        res = self.client.request('DELETE', f'/api/removeaccount/{str(self.id)}')
-        if res['status'] != 'success':
-            raise Exception('failed deleting user account')
-        
-        del self.client.users.cache[self.uuid]
-        return None
+        return self.client.users.remove(self)
 
 
 # TODO: helper functions for server class
 # TODO: DashServerResourceManager class
 class DashServer:
+    __slots__ = ('client', 'id', 'uuid', 'identifier', 'name', 'description',
+                'status', 'is_suspended', 'user', 'owner', 'node', 'allocation',
+                'nest', 'egg', 'created_at', 'updated_at', '_limits',
+                '_feature_limits', '_container')
+    
     def __init__(self, client, data: dict):
         att = data['attributes']
         self.client = client
@@ -54,27 +182,74 @@ class DashServer:
         self.identifier: str = att['identifier']
         self.name: str = att['name']
         self.description: str = att['description']
-        self.status: str = att['status'] or None
+        self.status: str = _intern(att['status'] or None)
         self.is_suspended: bool = att['suspended']
-        self.limits: dict = att['limits']
-        self.feature_limits: dict = att['feature_limits']
         self.user: int = att['user']
         self.owner: DashUser = None
-        self.node: int = att['node']
+        self.node: int = _intern(att['node'])
         self.allocation: int = att['allocation']
-        self.nest: int = att['nest']
-        self.egg: int = att['egg']
-        self.container: dict = att['container']
+        self.nest: int = _intern(att['nest'])
+        self.egg: int = _intern(att['egg'])
         self.created_at: str = att['created_at']
         self.updated_at: str = att['updated_at'] or None
+        self._limits = _pack(att['limits'])
+        self._feature_limits = _pack(att['feature_limits'])
+        self._container = _pack(att['container'])
+    
+    @property
+    def limits(self) -> dict:
+        if not isinstance(self._limits, dict):
+            self._limits = _unpack(self._limits)
+        
+        return self._limits
+    
+    @property
+    def feature_limits(self) -> dict:
+        if not isinstance(self._feature_limits, dict):
+            self._feature_limits = _unpack(self._feature_limits)
+        
+        return self._feature_limits
+    
+    @property
+    def container(self) -> dict:
+        if not isinstance(self._container, dict):
+            self._container = _unpack(self._container)
+        
+        return self._container
+    
+    def _patch(self, data: dict) -> bool:
+        # applies a newer payload in place, keeping the owner, and returns whether anything changed
+        new = DashServer(self.client, data)
+        changed = False
+        for name in self.__slots__:
+            if name in ('client', 'owner'):
+                continue
+            
+            old, value = getattr(self, name), getattr(new, name)
+            if name in ('_limits', '_feature_limits', '_container'):
+                # sections may have been decoded, so they are compared as dicts
+                same = (old if isinstance(old, dict) else _unpack(old)) == _unpack(value)
+            else:
+                same = old == value
+            
+            if not same:
+                setattr(self, name, value)
+                changed = True
+        
+        return changed
+    
+    def _footprint(self) -> tuple:
+        # read straight from the packed limits, which most servers never have decoded
+        limits = self._limits
+        if isinstance(limits, dict):
+            return (limits.get('memory') or 0, limits.get('disk') or 0, limits.get('cpu') or 0)
+        
+        return (_get(limits, 'memory') or 0, _get(limits, 'disk') or 0, _get(limits, 'cpu') or 0)
     
     def get_owner(self) -> Optional[DashUser]:
         '''Gets the owner of the server. May return `None` if not available.'''
         if not self.owner:
-            for user in self.client.users.cache:
-                if user.id == self.user:
-                    self.owner = user
-                    break
+            self.owner = self.client.users.cache.lookup(self.user, 'id')
         
         return self.owner
     
@@ -94,30 +269,16 @@ class DashServer:
         
         Modifies the RAM, disk, or CPU of the server. Returns the modified server on success.
         '''
-        if (0 < ram > MAX_AMOUNT or
-            0 < disk > MAX_AMOUNT or
-            0 < cpu > MAX_AMOUNT):
-            raise ValueError('server specs params must be between 1 and 9 hundred-trillion')
-        
-        res = self.client.request('GET', f'/modify?id={self.id}&ram={ram}&disk={disk}&cpu={cpu}')
-        if res['status'] != 'success':
-            return res
-        
-        return self
+        return self.client.servers._modify(self, ram, disk, cpu)
     
     def delete(self):
         '''Deletes the server. Returns `None` on success.'''
-        if not self.owner:
-            self.get_owner()
-        
-        res = self.client.request('DELETE', f'/api/deleteserver/{str(self.owner.id)}/{str(self.id)}')
-        if res['status'] != 'success':
-            return res
-        
-        return None
+        return self.client.servers._delete(self)
 
 
 class Coupon:
+    __slots__ = ('code', 'coins', 'ram', 'disk', 'cpu', 'servers')
+    
     def __init__(self, data: dict):
         self.code: str = data['code']
         self.coins: int = data['coins'] or 0
@@ -0,0 +1,195 @@
+from heapq import heappop, heappush
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Callable, List, Optional, Tuple
+from .structures import DashUser
+
+
+__all__ = ('SyncEngine',)
+
+class SyncEngine:
+    '''Re-polls cached users in the background and patches the fields that changed in place.'''
+    def __init__(self, client, budget: float=2.0, interval: float=30.0, max_interval: float=None):
+        '''`client` - The Dashactyl client
+        
+        `budget` - The largest number of polls sent per second (defaults to 2)
+        
+        `interval` - The number of seconds between polls of a user that is in use (defaults to 30)
+        
+        `max_interval` - The longest number of seconds between polls of an idle user (defaults to 20 intervals)
+        
+        Creates a new sync engine. Users are polled more often the more recently they were looked up,
+        and a user looked up after a long idle spell is polled again within one interval.
+        
+        Changes are reported to the functions in `on_change`, each called with
+        `(user, field, old, new)` for every field that changed. `coins` gives the old and new amounts,
+        `resources` the old and new totals, and `servers` a list of the servers removed and a list of
+        those added or changed.
+        '''
+        if budget <= 0:
+            raise ValueError('budget must be greater than 0')
+        
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+        
+        self.client = client
+        self.budget = budget
+        self.interval = interval
+        self.max_interval = max_interval or interval * 20
+        self.on_change: List[Callable] = []
+        self.polls = 0
+        self.changes = 0
+        self.failures = 0
+        self._due = {}
+        self._heap = []
+        self._accessed = {}
+        self._slot = 0.0
+        self._lock = Lock()
+        self._wake = Event()
+        self._stopped = Event()
+        self._worker = None
+    
+    def __repr__(self) -> str:
+        return f'<SyncEngine budget={self.budget} interval={self.interval} scheduled={len(self._due)}>'
+    
+    def _attach(self, cache):
+        # changes reach the engine through the users manager, which also releases the servers of dropped users
+        cache.accessed = self._looked_up
+    
+    def _schedule(self, key: str, due: float):
+        self._due[key] = due
+        heappush(self._heap, (due, key))
+        self._wake.set()
+    
+    def _changed(self, old: Optional[DashUser], new: Optional[DashUser]):
+        # called by the users cache whenever a user is cached, replaced, dropped or evicted
+        if new is None:
+            with self._lock:
+                self._due.pop(old.uuid, None)
+                self._accessed.pop(old.uuid, None)
+        elif old is None:
+            now = monotonic()
+            with self._lock:
+                self._accessed[new.uuid] = now
+                self._schedule(new.uuid, now + self.interval)
+                self._start()
+    
+    def _looked_up(self, key: str):
+        now = monotonic()
+        with self._lock:
+            self._accessed[key] = now
+            # an idle user in use again is brought back to the normal interval
+            due = self._due.get(key)
+            if due is not None and due > now + self.interval:
+                self._schedule(key, now + self.interval)
+            
+            self._start()
+    
+    def _pop(self) -> Tuple[Optional[str], Optional[float]]:
+        # returns the next user due within the budget, or how long to wait for one
+        now = monotonic()
+        with self._lock:
+            while self._heap:
+                due, key = self._heap[0]
+                if self._due.get(key) != due:
+                    heappop(self._heap)
+                    continue
+                
+                if due > now:
+                    return None, due - now
+                
+                if self._slot > now:
+                    return None, self._slot - now
+                
+                heappop(self._heap)
+                del self._due[key]
+                self._slot = now + 1 / self.budget
+                return key, None
+            
+            return None, None
+    
+    def _reschedule(self, key: str):
+        # checked outside the lock, as the cache calls into the engine while holding its own
+        if self.client.users.cache.peek(key) is None:
+            return
+        
+        now = monotonic()
+        with self._lock:
+            if key in self._due:
+                return
+            
+            idle = now - self._accessed.get(key, now)
+            self._schedule(key, now + min(self.max_interval, self.interval + idle))
+    
+    def _synced(self, user: DashUser, data: Optional[dict], validators: Optional[tuple]):
+        users = self.client.users
+        self.polls += 1
+        if data is None:
+            users.cache.refresh(user.uuid)
+            self.client._touch('users', user.uuid)
+            return
+        
+        if data['status'] != 'success':
+            self.failures += 1
+            return
+        
+        changes = user._patch(data)
+        if users.cache.peek(user.uuid) is user:
+            # cached again so changed usernames and emails are indexed
+            users.cache.add(user, validators)
+            self.client._persist('users', ((user.uuid, data, validators),))
+        
+        self.changes += len(changes)
+        for field, (old, new) in changes.items():
+            for hook in self.on_change:
+                hook(user, field, old, new)
+    
+    def _poll(self, key: str):
+        users = self.client.users
+        user = users.cache.peek(key)
+        if user is None:
+            return
+        
+        try:
+            self._synced(user, *self.client.conditional(users._path(users._key(user)),
+                                                        users.cache.validators(key)))
+        except Exception:
+            self.failures += 1
+        finally:
+            self._reschedule(key)
+    
+    def _start(self):
+        if self._worker is None and not self._stopped.is_set():
+            self._worker = Thread(target=self._run, daemon=True)
+            self._worker.start()
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            key, delay = self._pop()
+            if key is None:
+                self._wake.wait(delay)
+            else:
+                self._poll(key)
+    
+    def sync(self, user: DashUser):
+        '''`user` - The cached user to poll
+        
+        Polls a user straight away, outside of the schedule and the budget.
+        '''
+        with self._lock:
+            self._due.pop(user.uuid, None)
+        
+        self._poll(user.uuid)
+    
+    def close(self):
+        '''Stops polling. Users stay cached as they were last synced.'''
+        self._stopped.set()
+        self._wake.set()
+    
+    def stats(self) -> dict:
+        '''Returns a dict of the users scheduled, polls sent, fields changed and failed polls.'''
+        return {'scheduled': len(self._due),
+                'polls': self.polls,
+                'changes': self.changes,
+                'failures': self.failures}
@@ -0,0 +1,326 @@
+from typing import Any, Callable, Iterable, Mapping, Optional, Tuple
+
+
+__all__ = (
+    'Response',
+    'Transport',
+    'HTTPTransport',
+    'HTTP2Transport',
+    'LocalTransport',
+    'AsyncTransport',
+    'AsyncHTTPTransport',
+    'AsyncHTTP2Transport',
+    'AsyncLocalTransport'
+)
+
+CHUNK_SIZE = 65536
+
+class Headers(dict):
+    '''Response headers, looked up without regard to case.'''
+    def __init__(self, headers: Mapping[str, str]=None):
+        super().__init__((k.lower(), v) for k, v in (headers or {}).items())
+    
+    def __getitem__(self, key: str) -> str:
+        return super().__getitem__(key.lower())
+    
+    def __contains__(self, key: str) -> bool:
+        return super().__contains__(key.lower())
+    
+    def get(self, key: str, default: Any=None) -> Any:
+        return super().get(key.lower(), default)
+
+
+class Response:
+    '''A response as returned by a transport.'''
+    __slots__ = ('status', 'reason', 'headers', 'content', 'chunks', '_close')
+    
+    def __init__(self,
+                status: int,
+                reason: str,
+                headers: Mapping[str, str],
+                content: Optional[bytes]=b'',
+                chunks: Iterable[bytes]=None,
+                close: Callable[[], None]=None):
+        '''`status` - The status code
+        
+        `reason` - The reason phrase
+        
+        `headers` - The headers, as a mapping looked up without regard to case
+        
+        `content` - The body, or `None` if it is streamed
+        
+        `chunks` - The body as an iterable (or async iterable) of chunks, if it is streamed
+        
+        `close` - A function that releases the connection the response was read from
+        '''
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.chunks = chunks
+        self._close = close
+    
+    def __repr__(self) -> str:
+        return f'<Response status={self.status}>'
+    
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+    
+    def close(self):
+        if self._close is not None:
+            self._close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *_):
+        self.close()
+
+
+class Transport:
+    '''Sends the client's HTTP requests. Subclasses implement `send` and `close`.'''
+    # the exceptions raised when the panel cannot be reached, which are retried and trip the circuit
+    errors: Tuple[type, ...] = ()
+    
+    def send(self,
+            method: str,
+            url: str,
+            body: Optional[bytes],
+            headers: Mapping[str, str],
+            stream: bool=False) -> Response:
+        '''`method` - The HTTP method
+        
+        `url` - The full URL to request
+        
+        `body` - The encoded request body, if any
+        
+        `headers` - The request headers
+        
+        `stream` - Whether the body should be streamed as `chunks` instead of read into `content`
+        
+        Sends a request and returns its response.
+        '''
+        raise NotImplementedError
+    
+    def close(self):
+        '''Closes all connections held by the transport.'''
+        pass
+
+
+class HTTPTransport(Transport):
+    '''Pooled HTTP/1.1 connections through `requests`.'''
+    def __init__(self, pool_connections: int=1, pool_maxsize: int=10):
+        '''`pool_connections` - The number of host pools to keep (defaults to 1)
+        
+        `pool_maxsize` - The maximum number of connections kept per host (defaults to 10)
+        '''
+        # requests is only imported once a transport is made, which keeps importing the package cheap
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.errors = (requests.RequestException,)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+    
+    def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        res = self._session.request(method, url, data=body, headers=headers, stream=stream)
+        if stream:
+            return Response(res.status_code, res.reason, res.headers, None, res.iter_content(CHUNK_SIZE), res.close)
+        
+        return Response(res.status_code, res.reason, res.headers, res.content)
+    
+    def close(self):
+        self._session.close()
+
+
+def _httpx():
+    try:
+        import httpx
+        import h2
+    except ImportError:
+        raise RuntimeError('httpx and h2 are required for HTTP/2, install dashactylpy[http2]') from None
+    
+    return httpx
+
+
+class HTTP2Transport(Transport):
+    '''HTTP/2 through `httpx`, which multiplexes concurrent requests over one connection per host.'''
+    def __init__(self, max_connections: int=10):
+        '''`max_connections` - The maximum number of connections kept open (defaults to 10)
+        
+        Panels that do not offer HTTP/2 are spoken to over HTTP/1.1.
+        '''
+        httpx = _httpx()
+        self.errors = (httpx.TransportError,)
+        self._client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=max_connections))
+    
+    def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        if stream:
+            res = self._client.send(self._client.build_request(method, url, content=body, headers=headers), stream=True)
+            return Response(res.status_code, res.reason_phrase, res.headers, None, res.iter_bytes(CHUNK_SIZE), res.close)
+        
+        res = self._client.request(method, url, content=body, headers=headers)
+        return Response(res.status_code, res.reason_phrase, res.headers, res.content)
+    
+    def close(self):
+        self._client.close()
+
+
+def _local(status: int, headers: Mapping[str, str], body: bytes, stream: bool) -> Response:
+    from http import HTTPStatus
+    
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ''
+    
+    if stream:
+        return Response(status, reason, Headers(headers), None,
+                        [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)])
+    
+    return Response(status, reason, Headers(headers), body)
+
+
+def _path(url: str) -> str:
+    # the client always sends the panel domain followed by the path
+    start = url.find('/', url.find('//') + 2)
+    return url[start:] if start != -1 else '/'
+
+
+class LocalTransport(Transport):
+    '''Dispatches requests straight to a function in the same process, without touching the network.'''
+    def __init__(self, handler: Callable[[str, str, Optional[bytes], Mapping[str, str]], tuple]):
+        '''`handler` - A function called with `(method, path, body, headers)` that returns
+        a `(status, headers, body)` tuple, where the body is encoded JSON
+        '''
+        self.handler = handler
+    
+    def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        return _local(*self.handler(method, _path(url), body, headers), stream)
+
+
+class AsyncTransport:
+    '''Sends the async client's HTTP requests. Subclasses implement `send` and `close` as coroutines.'''
+    errors: Tuple[type, ...] = ()
+    
+    async def send(self,
+                    method: str,
+                    url: str,
+                    body: Optional[bytes],
+                    headers: Mapping[str, str],
+                    stream: bool=False) -> Response:
+        '''Sends a request and returns its response, like `Transport.send`.
+        Streamed responses have an async iterable of `chunks`.
+        '''
+        raise NotImplementedError
+    
+    async def close(self):
+        '''Closes all connections held by the transport.'''
+        pass
+
+
+class AsyncHTTPTransport(AsyncTransport):
+    '''Pooled HTTP/1.1 connections through `aiohttp`.'''
+    def __init__(self, limit: int=10, limit_per_host: int=10, keep_alive: bool=True):
+        '''`limit` - The maximum number of connections kept open (defaults to 10)
+        
+        `limit_per_host` - The maximum number of connections kept open per host (defaults to 10)
+        
+        `keep_alive` - Whether connections should be reused between requests (defaults to `True`)
+        '''
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError('aiohttp is required for AsyncDashactyl, install dashactylpy[async]') from None
+        
+        import asyncio
+        
+        self._aiohttp = aiohttp
+        self.errors = (aiohttp.ClientError, asyncio.TimeoutError)
+        self._pool = (limit, limit_per_host, keep_alive)
+        self._session = None
+    
+    def _connection(self):
+        # the session has to be created inside the running event loop
+        if self._session is None or self._session.closed:
+            limit, per_host, keep_alive = self._pool
+            self._session = self._aiohttp.ClientSession(
+                connector=self._aiohttp.TCPConnector(limit=limit,
+                                                    limit_per_host=per_host,
+                                                    force_close=not keep_alive))
+        
+        return self._session
+    
+    async def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        res = await self._connection().request(method, url, data=body, headers=headers)
+        if stream and res.ok:
+            return Response(res.status, res.reason, res.headers, None, res.content.iter_chunked(CHUNK_SIZE), res.close)
+        
+        async with res:
+            return Response(res.status, res.reason, res.headers, await res.read())
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class AsyncHTTP2Transport(AsyncTransport):
+    '''HTTP/2 through `httpx`, which multiplexes concurrent requests over one connection per host.'''
+    def __init__(self, max_connections: int=10):
+        '''`max_connections` - The maximum number of connections kept open (defaults to 10)
+        
+        Panels that do not offer HTTP/2 are spoken to over HTTP/1.1.
+        '''
+        httpx = _httpx()
+        self.errors = (httpx.TransportError,)
+        self._client = httpx.AsyncClient(http2=True, limits=httpx.Limits(max_connections=max_connections))
+    
+    async def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        if stream:
+            req = self._client.build_request(method, url, content=body, headers=headers)
+            res = await self._client.send(req, stream=True)
+            return Response(res.status_code, res.reason_phrase, res.headers, None, _released(res))
+        
+        res = await self._client.request(method, url, content=body, headers=headers)
+        return Response(res.status_code, res.reason_phrase, res.headers, res.content)
+    
+    async def close(self):
+        await self._client.aclose()
+
+
+class AsyncLocalTransport(AsyncTransport):
+    '''Dispatches requests straight to a function or coroutine function in the same process.'''
+    def __init__(self, handler: Callable[[str, str, Optional[bytes], Mapping[str, str]], Any]):
+        '''`handler` - A function called with `(method, path, body, headers)` that returns
+        (or resolves to) a `(status, headers, body)` tuple, where the body is encoded JSON
+        '''
+        self.handler = handler
+    
+    async def send(self, method: str, url: str, body: Optional[bytes], headers: Mapping[str, str], stream: bool=False) -> Response:
+        res = self.handler(method, _path(url), body, headers)
+        if hasattr(res, '__await__'):
+            res = await res
+        
+        local = _local(*res, stream)
+        if stream:
+            local.chunks = _aiter(local.chunks)
+        
+        return local
+
+
+async def _aiter(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _released(res):
+    # httpx can only close a response from a coroutine, so it is closed once the chunks are done with
+    try:
+        async for chunk in res.aiter_bytes(CHUNK_SIZE):
+            yield chunk
+    finally:
+        await res.aclose()
@@ -20,6 +20,7 @@ setup(name='dashactylpy',
         long_desription_content_type='text/markdown',
         include_package_data=True,
         install_requires=['requests'],
+        extras_require={'async': ['aiohttp'], 'fast': ['orjson'], 'numpy': ['numpy'], 'arrow': ['pyarrow'], 'http2': ['httpx[http2]']},
         python_requires='>=3.8.0',
         classifiers=[
             'Development Status :: 3 - Alpha',
@@ -0,0 +1,28 @@
+# Encode and decode throughput of the JSON codecs on userinfo payloads
+from time import perf_counter
+from dashactylpy import StdlibCodec, OrjsonCodec
+from fakepanel import userinfo
+
+N = 20_000
+codecs = [StdlibCodec()]
+try:
+    codecs.append(OrjsonCodec())
+except RuntimeError:
+    print('orjson is not installed, only the standard library is measured')
+
+payloads = [userinfo(i, servers=i % 4) for i in range(1000)]
+
+
+def rate(fn, items) -> float:
+    start = perf_counter()
+    for i in range(N):
+        fn(items[i % len(items)])
+    return N / (perf_counter() - start)
+
+
+for codec in codecs:
+    bodies = [codec.dumps(p) for p in payloads]
+    assert [codec.loads(b) for b in bodies] == payloads
+    print(f'{codec.name:<8} dumps {rate(codec.dumps, payloads):10.0f}/s  '
+          f'loads {rate(codec.loads, bodies):10.0f}/s  '
+          f'{sum(map(len, bodies)) / len(bodies):6.0f} B/payload')
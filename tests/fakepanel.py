@@ -0,0 +1,330 @@
+# Local Dashactyl stand-in server used by the benchmarks
+import re
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from multiprocessing import Pipe, Process
+from random import Random
+from threading import Lock, Thread
+from time import sleep
+from urllib.parse import urlsplit, parse_qs
+from zlib import crc32
+
+# Discord IDs are snowflakes, far from the panel IDs, so a client mixing the two up gets a 404
+SNOWFLAKE = 700000000000000000
+
+def snowflake(id: int) -> int:
+    '''Gets the Discord ID of the user with a panel ID, which the panel looks users up by.'''
+    return SNOWFLAKE + id
+
+
+def server(id: int, user: int, node: int=1, egg: int=3) -> dict:
+    '''Builds a Pterodactyl server object like the panel returns.'''
+    return {'object': 'server',
+            'attributes': {'id': id,
+                        'external_id': None,
+                        'uuid': f'{id:08x}-0000-4000-8000-{user:012x}',
+                        'identifier': f'{id:08x}',
+                        'name': f'server-{id}',
+                        'description': '',
+                        'status': None,
+                        'suspended': False,
+                        'limits': {'memory': 1024, 'swap': 0, 'disk': 5120, 'io': 500, 'cpu': 100, 'threads': None},
+                        'feature_limits': {'databases': 1, 'allocations': 1, 'backups': 1},
+                        'user': user,
+                        'node': node,
+                        'allocation': id,
+                        'nest': 1,
+                        'egg': egg,
+                        'container': {'startup_command': 'java -Xms128M -Xmx{{SERVER_MEMORY}}M -jar {{SERVER_JARFILE}}',
+                                    'image': 'ghcr.io/pterodactyl/yolks:java_17',
+                                    'installed': 1,
+                                    'environment': {'SERVER_JARFILE': 'server.jar', 'BUILD_NUMBER': 'latest'}},
+                        'created_at': '2021-07-01T12:00:00+00:00',
+                        'updated_at': '2021-07-01T12:00:00+00:00'}}
+
+
+def userinfo(id: int, servers: int=1) -> dict:
+    '''Builds an `/api/userinfo` response for a user with a number of servers.'''
+    return {'status': 'success',
+            'package': {'ram': 2048, 'disk': 10240, 'cpu': 150, 'servers': 2},
+            'extra': {'ram': 0, 'disk': 0, 'cpu': 0, 'servers': 0},
+            'coins': 100,
+            'userinfo': {'object': 'user',
+                        'attributes': {'id': id,
+                                    'external_id': None,
+                                    'uuid': f'{id:08x}-0000-4000-8000-000000000000',
+                                    'username': str(snowflake(id)),
+                                    'email': f'user{id}@example.com',
+                                    'first_name': f'user{id}',
+                                    'last_name': '#0001',
+                                    'language': 'en',
+                                    'root_admin': False,
+                                    '2fa': False,
+                                    'created_at': '2021-07-01T12:00:00+00:00',
+                                    'updated_at': '2021-07-01T12:00:00+00:00',
+                                    'relationships': {'servers': {'object': 'list',
+                                                                'data': [server(id * 10 + i, id) for i in range(servers)]}}}}}
+
+
+def coupon(code: str, coins: int=100) -> dict:
+    '''Builds a coupon object like the panel returns.'''
+    return {'code': code, 'coins': coins, 'ram': 0, 'disk': 0, 'cpu': 0, 'servers': 0}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def log_message(self, *_):
+        pass
+    
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        status, headers, body = self.server.panel.respond(self.command, self.path,
+                                                        self.rfile.read(length) if length else None, self.headers)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        
+        self.end_headers()
+        self.wfile.write(body)
+    
+    do_GET = do_POST = do_PATCH = do_DELETE = _reply
+
+
+class FakePanel:
+    '''A threaded HTTP server that answers like a Dashactyl panel.'''
+    def __init__(self,
+                host: str='127.0.0.1',
+                port: int=0,
+                latency: float=0.0,
+                error_rate: float=0.0,
+                servers: int=1,
+                coupons: int=100,
+                seed: int=0):
+        '''`latency` - The number of seconds every response is delayed by
+        
+        `error_rate` - The fraction of requests answered with a 503
+        
+        `servers` - The number of servers each user starts with
+        
+        `coupons` - The number of coupons the panel starts with
+        
+        Creates a panel whose users are made on first request, so any user ID exists.
+        '''
+        self.latency = latency
+        self.error_rate = error_rate
+        self.servers = servers
+        self.requests = 0
+        self.errors = 0
+        self.users = {}
+        self.coupons = {f'code{i}': coupon(f'code{i}') for i in range(coupons)}
+        self._random = Random(seed)
+        self._lock = Lock()
+        self._routes = tuple((method, re.compile(pattern), getattr(self, name)) for method, pattern, name in (
+                        ('GET', r'/api$', '_ping'),
+                        ('GET', r'/api/userinfo/(\d+)$', '_userinfo'),
+                        ('PATCH', r'/api/addcoins$', '_addcoins'),
+                        ('POST', r'/api/setcoins$', '_setcoins'),
+                        ('DELETE', r'/api/removeaccount/(\d+)$', '_removeaccount'),
+                        ('POST', r'/api/createserver$', '_createserver'),
+                        ('GET', r'/modify$', '_modify'),
+                        ('GET', r'/delete$', '_delete'),
+                        ('DELETE', r'/api/deleteserver/(\d+)/(\d+)$', '_deleteserver'),
+                        ('GET', r'/api/coupons$', '_coupons'),
+                        ('POST', r'/api/createcoupon$', '_createcoupon'),
+                        ('DELETE', r'/api/revokecoupon/([^/]+)$', '_revokecoupon')))
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.panel = self
+        self._thread = Thread(target=self.server.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def handle(self, method: str, path: str, params: dict) -> tuple:
+        '''Answers a request with a `(status, body)` pair, where the body is encoded JSON.'''
+        if self.latency:
+            sleep(self.latency)
+        
+        url = urlsplit(path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 503, b'{"status": "failed"}'
+            
+            status, res = 404, {'status': 'failed'}
+            for m, pattern, route in self._routes:
+                match = pattern.match(url.path)
+                if match and m == method:
+                    status, res = route(*match.groups(), query=query, params=params)
+                    break
+            
+            # encoded under the lock, since other requests may be changing the same user
+            return status, dumps(res).encode()
+    
+    def respond(self, method: str, path: str, body: bytes, headers: dict) -> tuple:
+        '''Answers a request with a `(status, headers, body)` tuple, answering 304 when the ETag still matches.
+        
+        Can be given to `LocalTransport` to serve a client without a socket.
+        '''
+        status, body = self.handle(method, path, loads(body) if body else {})
+        if method != 'GET' or status != 200:
+            return status, {'Content-Type': 'application/json'}, body
+        
+        etag = f'"{crc32(body):08x}"'
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, b''
+        
+        return status, {'Content-Type': 'application/json', 'ETag': etag}, body
+    
+    def _user(self, id) -> dict:
+        id = int(id)
+        if id not in self.users:
+            self.users[id] = userinfo(id, self.servers)
+        
+        return self.users[id]
+    
+    def _discord(self, key) -> dict:
+        id = int(key) - SNOWFLAKE
+        return None if id < 0 else self._user(id)
+    
+    def _servers(self, id) -> list:
+        return self._user(id)['userinfo']['attributes']['relationships']['servers']['data']
+    
+    def _ping(self, query: dict, params: dict) -> tuple:
+        return 200, {'status': 'success'}
+    
+    def _userinfo(self, id: str, query: dict, params: dict) -> tuple:
+        user = self._discord(id)
+        if user is None:
+            return 404, {'status': 'failed'}
+        
+        return 200, user
+    
+    def _addcoins(self, query: dict, params: dict) -> tuple:
+        user = self._discord(params['id'])
+        if user is None or 'coins' not in params:
+            return 400, {'status': 'failed'}
+        
+        user['coins'] += params['coins']
+        return 200, {'status': 'success'}
+    
+    def _setcoins(self, query: dict, params: dict) -> tuple:
+        user = self._discord(params['id'])
+        if user is None or 'coins' not in params:
+            return 400, {'status': 'failed'}
+        
+        user['coins'] = params['coins']
+        return 200, {'status': 'success'}
+    
+    def _removeaccount(self, id: str, query: dict, params: dict) -> tuple:
+        if self.users.pop(int(id), None) is None:
+            return 404, {'status': 'failed'}
+        
+        return 200, {'status': 'success'}
+    
+    def _createserver(self, query: dict, params: dict) -> tuple:
+        servers = self._servers(params['userid'])
+        user = int(params['userid'])
+        data = server(user * 10 + len(servers), user)
+        data['attributes'].update(name=params['name'], egg=params['egg'])
+        data['attributes']['limits'].update(memory=float(params['ram']),
+                                            disk=float(params['disk']),
+                                            cpu=float(params['cpu']))
+        servers.append(data)
+        return 200, {'status': 'success', 'data': data}
+    
+    def _modify(self, query: dict, params: dict) -> tuple:
+        for user in self.users.values():
+            for s in user['userinfo']['attributes']['relationships']['servers']['data']:
+                if str(s['attributes']['id']) == query.get('id'):
+                    limits = s['attributes']['limits']
+                    for key, name in (('ram', 'memory'), ('disk', 'disk'), ('cpu', 'cpu')):
+                        if key in query:
+                            limits[name] = float(query[key])
+                    
+                    return 200, {'status': 'success'}
+        
+        return 404, {'status': 'failed'}
+    
+    def _drop_server(self, match) -> tuple:
+        for user in self.users.values():
+            servers = user['userinfo']['attributes']['relationships']['servers']['data']
+            for s in servers:
+                if match(s['attributes']):
+                    servers.remove(s)
+                    return 200, {'status': 'success'}
+        
+        return 404, {'status': 'failed'}
+    
+    def _delete(self, query: dict, params: dict) -> tuple:
+        return self._drop_server(lambda s: query.get('id') in (s['identifier'], s['uuid']))
+    
+    def _deleteserver(self, user: str, id: str, query: dict, params: dict) -> tuple:
+        return self._drop_server(lambda s: s['id'] == int(id) and s['user'] == int(user))
+    
+    def _coupons(self, query: dict, params: dict) -> tuple:
+        if 'code' not in query:
+            return 200, {'status': 'success', 'coupons': list(self.coupons.values())}
+        
+        if query['code'] not in self.coupons:
+            return 404, {'status': 'failed'}
+        
+        return 200, {'status': 'success', 'coupon': self.coupons[query['code']]}
+    
+    def _createcoupon(self, query: dict, params: dict) -> tuple:
+        code = params.get('code') or f'code{len(self.coupons)}'
+        self.coupons[code] = c = coupon(code, params.get('coins') or 0)
+        c.update(ram=params.get('ram') or 0, disk=params.get('disk') or 0,
+                cpu=params.get('cpu') or 0, servers=params.get('servers') or 0)
+        return 200, dict(c, status='success')
+    
+    def _revokecoupon(self, code: str, query: dict, params: dict) -> tuple:
+        if self.coupons.pop(code, None) is None:
+            return 404, {'status': 'failed'}
+        
+        return 200, {'status': 'success'}
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *_):
+        self.stop()
+
+
+def _serve(conn, options: dict):
+    panel = FakePanel(**options)
+    conn.send(panel.url)
+    panel.server.serve_forever()
+
+
+@contextmanager
+def spawn(**options):
+    '''Runs a `FakePanel` in a child process, so it neither competes for the GIL
+    nor shows up in the allocations of the process being measured. Yields its URL.
+    '''
+    parent, child = Pipe()
+    proc = Process(target=_serve, args=(child, options), daemon=True)
+    proc.start()
+    try:
+        yield parent.recv()
+    finally:
+        proc.terminate()
+        proc.join()
@@ -0,0 +1,54 @@
+# Import time of the package, which loads its submodules and HTTP stack on first use
+#
+# Exits with status 1 if an import is over its budget or pulls in a heavy dependency early.
+import os
+import subprocess
+import sys
+import tempfile
+
+RUNS = 7
+BUDGETS_MS = {'import dashactylpy': 1,
+            'from dashactylpy import Dashactyl': 10,
+            'from dashactylpy import Dashactyl, DashUser, CachePolicy': 10}
+HEAVY = ('requests', 'urllib3', 'aiohttp', 'asyncio', 'sqlite3', 'orjson', 'concurrent.futures')
+
+CODE = '''import sys, time
+sys.stderr.write('--\\n')
+start = time.perf_counter()
+{}
+print((time.perf_counter() - start) * 1000)
+print(','.join(m for m in {!r} if m in sys.modules))
+'''
+
+
+def measure(stmt: str, env: dict) -> tuple:
+    best, heavy, slowest = None, '', []
+    for _ in range(RUNS):
+        res = subprocess.run([sys.executable, '-X', 'importtime', '-c', CODE.format(stmt, HEAVY)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True)
+        ms, heavy = res.stdout.splitlines()
+        if best is None or float(ms) < best:
+            best = float(ms)
+            # -X importtime lines are 'import time: self | cumulative | name'
+            lines = res.stderr.split('--\n', 1)[1].splitlines()
+            rows = [line.split('|') for line in lines if line.startswith('import time:')]
+            slowest = sorted(((int(r[0].split(':')[1]), r[2].strip()) for r in rows), reverse=True)[:3]
+    return best, heavy, slowest
+
+
+# bytecode is cached outside the tree so the first run's compile time is not measured
+env = dict(os.environ, PYTHONPATH=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+            PYTHONPYCACHEPREFIX=tempfile.mkdtemp())
+env.pop('PYTHONDONTWRITEBYTECODE', None)
+failed = False
+for stmt, budget in BUDGETS_MS.items():
+    ms, heavy, slowest = measure(stmt, env)
+    over = ms > budget or heavy
+    failed |= bool(over)
+    print(f'{"FAIL" if over else "ok  "} {ms:6.2f} ms (budget {budget} ms)  {stmt}')
+    if heavy:
+        print(f'     imported eagerly: {heavy}')
+    print('     slowest: ' + ', '.join(f'{name} {us / 1000:.2f} ms' for us, name in slowest))
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,36 @@
+# Memory held by 100k cached users with one server each
+import tracemalloc
+from dashactylpy import Dashactyl, DashUser
+from fakepanel import userinfo
+
+N = 100_000
+
+
+def held(build) -> int:
+    tracemalloc.start()
+    objs = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size
+
+
+dash = Dashactyl('http://127.0.0.1', 'key')
+payloads = lambda: [userinfo(i) for i in range(N)]
+users = lambda: [DashUser(dash, userinfo(i)) for i in range(N)]
+
+
+def decoded():
+    res = users()
+    for u in res:
+        u.coins, u.resources
+        for s in u.servers.cache.values():
+            s.limits, s.feature_limits, s.container
+    return res
+
+
+for name, build in (('raw payloads', payloads),
+                    ('structures', users),
+                    ('fully decoded', decoded)):
+    size = held(build)
+    print(f'{name:<14} {size / 2**20:8.1f} MiB  {size / N:6.0f} B/user+server')
@@ -0,0 +1,29 @@
+# Requests-per-second of the pooled client against one-off connections
+import requests
+from time import perf_counter
+from dashactylpy import Dashactyl
+from fakepanel import FakePanel
+
+N = 2000
+
+
+def unpooled(url: str) -> float:
+    start = perf_counter()
+    for _ in range(N):
+        requests.get(url + '/api',
+                    headers={'Content-Type': 'application/json',
+                            'Authorization': 'Bearer key'}).json()
+    return N / (perf_counter() - start)
+
+
+def pooled(url: str) -> float:
+    with Dashactyl(url, 'key') as dash:
+        start = perf_counter()
+        for _ in range(N):
+            dash.request('GET', '/api')
+        return N / (perf_counter() - start)
+
+
+with FakePanel() as panel:
+    print(f'unpooled: {unpooled(panel.url):.0f} req/s')
+    print(f'pooled:   {pooled(panel.url):.0f} req/s')
@@ -0,0 +1,142 @@
+# Throughput, latency and allocations of the client's main operations against a local panel
+#
+#   python suite.bench.py [--latency 0.002] [--error-rate 0.01] [--ops 500] [--local] [scenario ...]
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from statistics import quantiles
+from time import perf_counter_ns
+from dashactylpy import Dashactyl, DashUser, LocalTransport, RetryPolicy
+from fakepanel import FakePanel, snowflake, spawn, userinfo
+
+BATCH = 20
+
+
+def build_user(dash: Dashactyl):
+    payloads = [userinfo(i, servers=2) for i in range(1000)]
+    return lambda i: DashUser(dash, payloads[i % len(payloads)])
+
+
+def cold_fetch(dash: Dashactyl):
+    ids = count(1_000_000)
+    return lambda i: dash.users.fetch(snowflake(next(ids)))
+
+
+def revalidate(dash: Dashactyl):
+    for id in range(100):
+        dash.users.fetch(snowflake(id))
+    return lambda i: dash.users.fetch(snowflake(i % 100))
+
+
+def cached_get(dash: Dashactyl):
+    for id in range(100):
+        dash.users.fetch(snowflake(id))
+    return lambda i: dash.users.get(snowflake(i % 100))
+
+
+def coin_updates(dash: Dashactyl):
+    users = [dash.users.fetch(snowflake(id)) for id in range(BATCH)]
+    pool = ThreadPoolExecutor(8)
+    return lambda i: list(pool.map(lambda u: u.coins.add(1), users))
+
+
+def fetch_many(dash: Dashactyl):
+    starts = count(2_000_000, BATCH)
+    
+    def op(i):
+        start = next(starts)
+        return list(dash.users.fetch_many(map(snowflake, range(start, start + BATCH))))
+    return op
+
+
+def coupon_listing(dash: Dashactyl):
+    return lambda i: dash.coupons.fetch()
+
+
+def coupon_stream(dash: Dashactyl):
+    return lambda i: sum(1 for _ in dash.coupons.iter_coupons())
+
+
+SCENARIOS = {'build user': build_user,
+            'cold fetch': cold_fetch,
+            'revalidate': revalidate,
+            'cached get': cached_get,
+            f'coins x{BATCH}': coin_updates,
+            f'fetch_many x{BATCH}': fetch_many,
+            'coupon listing': coupon_listing,
+            'coupon stream': coupon_stream}
+
+
+def timed(op, ops: int) -> tuple:
+    times, errors = [], 0
+    for i in range(ops):
+        start = perf_counter_ns()
+        try:
+            res = op(i)
+        except Exception:
+            errors += 1
+        else:
+            errors += isinstance(res, dict) and res.get('status') == 'failed'
+        times.append(perf_counter_ns() - start)
+    return times, errors
+
+
+def allocated(op, ops: int) -> tuple:
+    # peak is the most memory one operation needed at once, retained what it left behind
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for i in range(ops):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            op(i)
+        except Exception:
+            pass
+        peak += tracemalloc.get_traced_memory()[1] - before
+    retained = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return peak / ops, retained / ops
+
+
+def run(url: str, names: list, ops: int, retries: bool, transport=None):
+    print(f'{"scenario":<16} {"ops/s":>10} {"p50 ms":>9} {"p99 ms":>9} {"errors":>7} {"peak KiB/op":>12} {"kept B/op":>10}')
+    for name in names:
+        dash = Dashactyl(url, 'key', retry_policy=RetryPolicy(backoff=0.001) if retries else None,
+                        transport=transport and transport())
+        op = SCENARIOS[name](dash)
+        timed(op, min(ops, 20))
+        times, errors = timed(op, ops)
+        p = quantiles(times, n=100)
+        peak, kept = allocated(op, max(1, ops // 5))
+        print(f'{name:<16} {ops * 1e9 / sum(times):>10.0f} {p[49] / 1e6:>9.3f} {p[98] / 1e6:>9.3f} '
+            f'{errors:>7} {peak / 1024:>12.1f} {kept:>10.0f}')
+        dash.close()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmarks the client against a local Dashactyl stand-in.')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f'scenarios to run (defaults to all of: {", ".join(SCENARIOS)})')
+    parser.add_argument('--ops', type=int, default=500, help='operations per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the panel delays each response by')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests the panel fails with a 503')
+    parser.add_argument('--coupons', type=int, default=1000, help='number of coupons the panel lists')
+    parser.add_argument('--in-process', action='store_true', help='run the panel in this process instead of a child')
+    parser.add_argument('--local', action='store_true', help='call the panel directly instead of over a socket')
+    args = parser.parse_args()
+    
+    options = dict(latency=args.latency, error_rate=args.error_rate, coupons=args.coupons)
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name!r}')
+    
+    if args.local or args.in_process:
+        with FakePanel(**options) as panel:
+            local = (lambda: LocalTransport(panel.respond)) if args.local else None
+            run(panel.url, names, args.ops, args.error_rate > 0, local)
+    else:
+        with spawn(**options) as url:
+            run(url, names, args.ops, args.error_rate > 0)
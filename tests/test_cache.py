@@ -0,0 +1,213 @@
+# Index, group and eviction bookkeeping of the cache
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, active_count
+from time import sleep
+from dashactylpy import AsyncDashactyl, AsyncLocalTransport, Cache, CachePolicy, Coupon, Dashactyl, DashUser, LocalTransport
+from fakepanel import FakePanel, coupon, snowflake, userinfo
+
+
+class Item:
+    def __init__(self, key: str, name: str, group: int):
+        self.key = key
+        self.name = name
+        self.group = group
+
+
+def cache(policy: CachePolicy=None) -> Cache:
+    c = Cache('key', 'name', groups=('group',), policy=policy)
+    c.events = []
+    c.changed = lambda old, new: c.events.append((old and old.key, new and new.key))
+    return c
+
+
+def test_lookup_by_key_and_index():
+    c = cache()
+    a = c.add(Item('a', 'alpha', 1))
+    assert c.lookup('a') is a
+    assert c.lookup('alpha') is a
+    assert c.lookup('alpha', 'name') is a
+    assert c.lookup('missing') is None
+    assert (c.hits, c.misses) == (3, 1)
+
+
+def test_replacing_reindexes():
+    c = cache()
+    c.add(Item('a', 'alpha', 1))
+    b = c.add(Item('a', 'beta', 2))
+    assert c.lookup('alpha') is None
+    assert c.lookup('beta') is b
+    assert c.group('group', 1) == []
+    assert c.group('group', 2) == [b]
+    assert c.count('group') == {2: 1}
+    assert c.events == [(None, 'a'), ('a', 'a')]
+
+
+def test_delete_unindexes():
+    c = cache()
+    c.add(Item('a', 'alpha', 1))
+    c.add(Item('b', 'beta', 1))
+    del c['a']
+    assert c.peek('alpha') is None
+    assert c.count('group') == {1: 1}
+    del c['b']
+    assert c.count('group') == {}
+    assert c.bytes == 0
+    assert c._indexes == {'name': {}}
+
+
+def test_where_uses_indexes_and_checks_values():
+    c = cache()
+    items = [c.add(Item(str(i), f'n{i}', i % 3)) for i in range(30)]
+    assert c.where(group=1) == [i for i in items if i.group == 1]
+    assert c.where(group=1, name='n4') == [items[4]]
+    assert c.where(group=2, name='n4') == []
+    assert c.where(key='7') == [items[7]]
+    assert len(c.where()) == 30
+
+
+def test_lru_eviction():
+    c = cache(CachePolicy(max_size=2))
+    c.add(Item('a', 'alpha', 1))
+    c.add(Item('b', 'beta', 1))
+    c.lookup('a')
+    c.add(Item('c', 'gamma', 2))
+    assert list(c) == ['a', 'c']
+    assert c.peek('beta') is None
+    assert c.count('group') == {1: 1, 2: 1}
+    assert c.evictions == 1
+    assert ('b', None) in c.events
+
+
+def test_ttl_expiry():
+    c = cache(CachePolicy(ttl=0.01))
+    c.add(Item('a', 'alpha', 1))
+    sleep(0.02)
+    assert c.lookup('alpha') is None
+    assert 'a' not in c
+    assert c.count('group') == {}
+    assert c.events[-1] == ('a', None)
+
+
+def test_prune():
+    c = cache(CachePolicy(ttl=0.01))
+    c.add(Item('a', 'alpha', 1))
+    c.add(Item('b', 'beta', 1))
+    sleep(0.02)
+    c.add(Item('c', 'gamma', 1))
+    assert c.prune() == 2
+    assert list(c) == ['c']
+    assert c.count('group') == {1: 1}
+
+
+def test_restored_entries_are_served_then_revalidated():
+    c = cache()
+    revalidated = []
+    c.revalidate = lambda v: revalidated.append(v.key)
+    c.add(Item('a', 'alpha', 1), age=3600)
+    assert c.lookup('a') is not None
+    assert c.lookup('a') is not None
+    assert revalidated == ['a']
+    assert c.prune() == 0
+    c.refresh('a')
+    c.lookup('a')
+    assert revalidated == ['a']
+
+
+def test_revalidations_are_bounded():
+    panel = FakePanel(latency=0.005)
+    lock = Lock()
+    flying = [0, 0]
+    
+    def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        with lock:
+            flying[0] += 1
+            flying[1] = max(flying)
+        
+        try:
+            return panel.respond(method, path, body, headers)
+        finally:
+            with lock:
+                flying[0] -= 1
+    
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(respond), max_revalidations=3)
+    for i in range(300):
+        dash.users.cache.add(DashUser(dash, userinfo(i)), age=3600)
+    
+    threads = active_count()
+    for i in range(300):
+        assert dash.users.get(snowflake(i)) is not None
+    
+    assert active_count() <= threads + 3
+    dash.close()
+    assert flying[1] <= 3
+
+
+def test_async_revalidations_are_bounded():
+    panel = FakePanel()
+    flying = [0, 0]
+    
+    async def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        flying[0] += 1
+        flying[1] = max(flying)
+        await asyncio.sleep(0.005)
+        flying[0] -= 1
+        return panel.respond(method, path, body, headers)
+    
+    async def run():
+        dash = AsyncDashactyl('http://panel', 'key', transport=AsyncLocalTransport(respond), max_revalidations=3)
+        for i in range(50):
+            dash.coupons.cache.add(Coupon(coupon(f'code{i}')), age=3600)
+        
+        for i in range(50):
+            assert await dash.coupons.get(f'code{i}') is not None
+        
+        while panel.requests < 50:
+            await asyncio.sleep(0.01)
+    
+    asyncio.run(run())
+    assert flying[1] == 3
+
+
+def test_user_cache_follows_the_panel():
+    panel = FakePanel()
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond),
+                    cache_policy=CachePolicy(max_size=5))
+    users = [dash.users.fetch(snowflake(i)) for i in range(8)]
+    assert len(dash.users.cache) == 5
+    assert dash.users.cache.peek(users[0].uuid) is None
+    assert dash.users.get(snowflake(7)) is users[7]
+    assert dash.users.cache.lookup(users[7].email) is users[7]
+    assert dash.users.count() == {False: 5}
+    dash.users.remove(users[7])
+    assert dash.users.cache.peek(snowflake(7)) is None
+    assert dash.users.count() == {False: 4}
+
+
+def test_concurrent_gets_share_one_user():
+    panel = FakePanel(latency=0.05)
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond))
+    with ThreadPoolExecutor(8) as pool:
+        users = list(pool.map(lambda _: dash.users.get(snowflake(1)), range(8)))
+    
+    assert all(u is users[0] for u in users)
+    assert dash.users.cache.peek(users[0].uuid) is users[0]
+    assert panel.requests == 1
+
+
+def test_concurrent_async_gets_share_one_coupon():
+    panel = FakePanel()
+    
+    async def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        await asyncio.sleep(0.05)
+        return panel.respond(method, path, body, headers)
+    
+    async def run() -> list:
+        dash = AsyncDashactyl('http://panel', 'key', transport=AsyncLocalTransport(respond))
+        coupons = await asyncio.gather(*(dash.coupons.get('code1') for _ in range(8)))
+        assert dash.coupons.cache.peek('code1') is coupons[0]
+        return coupons
+    
+    coupons = asyncio.run(run())
+    assert all(c is coupons[0] for c in coupons)
+    assert panel.requests == 1
@@ -0,0 +1,117 @@
+# Merging, sending and rolling back buffered coin changes
+import os
+import sys
+from json import loads
+from pathlib import Path
+from subprocess import run
+from dashactylpy import Dashactyl, LocalTransport
+from fakepanel import FakePanel, snowflake
+
+
+def client(panel: FakePanel) -> tuple:
+    sent = []
+    
+    def handler(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        if method != 'GET':
+            sent.append((path, loads(body) if body else None))
+        
+        return panel.respond(method, path, body, headers)
+    
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(handler),
+                    buffer_coins=True, coin_flush_interval=None)
+    return dash, sent
+
+
+def coins(panel: FakePanel, user) -> int:
+    return panel.users[user.id]['coins']
+
+
+def test_changes_are_merged_into_one_request():
+    panel = FakePanel()
+    dash, sent = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    assert user.coins.add(5) == 105
+    assert user.coins.add(10) == 115
+    assert coins(panel, user) == 100
+    assert dash.flush() == []
+    assert sent == [('/api/addcoins', {'id': str(snowflake(1)), 'coins': 15})]
+    assert coins(panel, user) == user.coins.amount == 115
+
+
+def test_removals_are_sent_like_unbuffered_ones():
+    panel = FakePanel()
+    dash, sent = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    user.coins.remove(30)
+    user.coins.add(5)
+    assert dash.flush() == []
+    assert sent == [('/api/setcoins', {'id': str(snowflake(1)), 'coins': 75})]
+    assert coins(panel, user) == 75
+    
+    unbuffered = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond))
+    other = unbuffered.users.fetch(snowflake(2))
+    other.coins.remove(30)
+    assert coins(panel, other) == 70
+
+
+def test_failed_flush_rolls_back():
+    panel = FakePanel()
+    dash, _ = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    user.coins.add(50)
+    panel.error_rate = 1.0
+    failures = dash.flush()
+    assert [u for u, _ in failures] == [user]
+    assert failures[0][1]['status'] == 'failed'
+    assert user.coins.amount == 100
+    assert dash.coin_buffer.failures == 1
+    
+    panel.error_rate = 0.0
+    user.coins.set(40)
+    assert dash.flush() == []
+    assert coins(panel, user) == user.coins.amount == 40
+
+
+def test_changes_made_during_a_failed_flush_stay_applied():
+    panel = FakePanel()
+    dash, _ = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    user.coins.add(50)
+    
+    def fail(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        # a change queued while the first one is in flight
+        user.coins.add(7)
+        return 503, {}, b'{"status": "failed"}'
+    
+    dash.transport = LocalTransport(fail)
+    assert len(dash.flush()) == 1
+    assert user.coins.amount == 107
+    
+    dash.transport = LocalTransport(panel.respond)
+    assert dash.flush() == []
+    assert coins(panel, user) == user.coins.amount == 107
+
+
+def test_close_flushes():
+    panel = FakePanel()
+    dash, _ = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    user.coins.add(1)
+    dash.close()
+    assert coins(panel, user) == 101
+
+
+def test_unclosed_buffer_flushes_at_exit():
+    script = (
+        'import atexit\n'
+        'from fakepanel import FakePanel, snowflake\n'
+        'panel = FakePanel()\n'
+        "atexit.register(lambda: print(panel.users[1]['coins']))\n"
+        'from dashactylpy import Dashactyl, LocalTransport\n'
+        "dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond),\n"
+        '                buffer_coins=True, coin_flush_interval=60)\n'
+        'dash.users.fetch(snowflake(1)).coins.add(5)\n')
+    tests = Path(__file__).parent
+    out = run([sys.executable, '-c', script], cwd=tests.parent, capture_output=True, text=True,
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join((str(tests.parent), str(tests)))})
+    assert out.stdout.strip() == '105', out.stderr
@@ -0,0 +1,90 @@
+# Concurrency adaptation, pauses and resends of the rate limiter
+from email.utils import formatdate
+from time import monotonic, time
+from dashactylpy import Dashactyl, LocalTransport, RateLimiter
+from fakepanel import FakePanel, snowflake
+
+
+def released(limiter: RateLimiter, status: int, headers: dict={}, latency: float=0.01) -> RateLimiter:
+    limiter.acquire()
+    limiter.release(status, headers, latency)
+    return limiter
+
+
+def paused(limiter: RateLimiter) -> float:
+    return limiter.paused_until - monotonic()
+
+
+def test_limit_grows_only_on_success():
+    limiter = RateLimiter(max_concurrency=8)
+    limiter.limit = 4.0
+    released(limiter, 503)
+    released(limiter, None)
+    assert limiter.limit == 4.0
+    released(limiter, 200)
+    assert limiter.limit == 4.25
+    released(limiter, 404)
+    assert limiter.limit > 4.25
+
+
+def test_slow_responses_lower_the_limit():
+    limiter = RateLimiter(max_concurrency=8, min_concurrency=2, target_latency=0.1)
+    released(limiter, 200, latency=0.5)
+    assert limiter.limit == 7.2
+    for _ in range(50):
+        released(limiter, 200, latency=0.5)
+    
+    assert limiter.limit == 2
+
+
+def test_429_halves_the_limit_and_pauses():
+    limiter = released(RateLimiter(max_concurrency=8), 429, {'Retry-After': '5'})
+    assert limiter.limit == 4
+    assert limiter.throttled == 1
+    assert 4.9 < paused(limiter) <= 5
+    
+    limiter = released(RateLimiter(), 429, {'Retry-After': formatdate(time() + 30, usegmt=True)})
+    assert 28 < paused(limiter) <= 30
+    limiter = released(RateLimiter(), 429, {'Retry-After': 'soon'})
+    assert 0.9 < paused(limiter) <= 1
+
+
+def test_exhausted_quota_pauses_until_reset():
+    limiter = released(RateLimiter(), 200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '3'})
+    assert 2.9 < paused(limiter) <= 3
+    limiter = released(RateLimiter(), 200, {'RateLimit-Remaining': '0', 'RateLimit-Reset': str(int(time()) + 20)})
+    assert 18 < paused(limiter) <= 20
+    limiter = released(RateLimiter(), 200, {'X-RateLimit-Remaining': '4', 'X-RateLimit-Reset': '3'})
+    assert paused(limiter) <= 0
+
+
+def test_throttled_requests_are_sent_again():
+    panel = FakePanel()
+    calls = []
+    
+    def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        calls.append(path)
+        if len(calls) < 3:
+            return 429, {'Retry-After': '0'}, b'{"status": "failed"}'
+        
+        return panel.respond(method, path, body, headers)
+    
+    limiter = RateLimiter(max_concurrency=4)
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(respond), rate_limiter=limiter)
+    assert dash.users.fetch(snowflake(1)).id == 1
+    assert len(calls) == 3
+    assert limiter.throttled == 2
+    assert limiter.in_flight == 0
+
+
+def test_resends_stop_after_retries():
+    calls = []
+    
+    def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        calls.append(path)
+        return 429, {'Retry-After': '0'}, b'{"status": "failed"}'
+    
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(respond),
+                    rate_limiter=RateLimiter(retries=2))
+    assert dash.request('GET', '/api')['status'] == 'failed'
+    assert len(calls) == 3
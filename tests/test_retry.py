@@ -0,0 +1,128 @@
+# Retries of failed requests and the circuit breaker around them
+import asyncio
+from time import sleep
+from dashactylpy import (AsyncDashactyl, AsyncLocalTransport, CircuitBreaker, CircuitOpenError,
+                        Dashactyl, LocalTransport, RetryPolicy)
+from fakepanel import FakePanel, snowflake
+
+
+def failing(panel: FakePanel, failures: int, paths: tuple=('/api',)) -> tuple:
+    calls = []
+    
+    def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        # the panel handles the request, but the answer is lost for the first few
+        calls.append(path)
+        res = panel.respond(method, path, body, headers)
+        if len(calls) <= failures and path.startswith(paths):
+            return 503, {}, b'{"status": "failed"}'
+        
+        return res
+    
+    return respond, calls
+
+
+def test_retryable():
+    retry = RetryPolicy(retries=2)
+    assert retry.retryable('GET', 0)
+    assert retry.retryable('GET', 1, 503)
+    assert not retry.retryable('GET', 2, 503)
+    assert not retry.retryable('GET', 0, 404)
+    assert not retry.retryable('POST', 0)
+    assert retry.retryable('GET', 0, 503, '/api/userinfo/1')
+    assert not retry.retryable('GET', 0, 503, '/modify?id=1&ram=1024')
+    assert not retry.retryable('GET', 0, None, '/delete?id=abc')
+    assert RetryPolicy(unsafe_paths=()).retryable('GET', 0, 503, '/delete?id=abc')
+
+
+def test_reads_are_retried():
+    panel = FakePanel()
+    respond, calls = failing(panel, 2)
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(respond),
+                    retry_policy=RetryPolicy(backoff=0))
+    assert dash.users.fetch(snowflake(1)).id == 1
+    assert len(calls) == 3
+    assert dash.retry_policy.attempts == 2
+
+
+def test_mutating_gets_are_not_retried():
+    panel = FakePanel()
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond),
+                    retry_policy=RetryPolicy(backoff=0))
+    user = dash.users.fetch(snowflake(1))
+    server = user.servers.find(lambda s: True)
+    respond, calls = failing(panel, 1, ('/modify', '/delete'))
+    dash.transport = LocalTransport(respond)
+    assert server.modify(ram=512)['status'] == 'failed'
+    assert calls == [f'/modify?id={server.id}&ram=512']
+    
+    # a server the client has not cached is deleted through the panel's GET route
+    calls.clear()
+    other = panel._servers(2)[0]['attributes']['identifier']
+    assert user.servers.delete(other)['status'] == 'failed'
+    assert calls == [f'/delete?id={other}']
+    assert panel._servers(2) == []
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.02)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    sleep(0.03)
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == 'open'
+    assert breaker.trips == 2
+    sleep(0.03)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failing_panel_trips_the_breaker():
+    panel = FakePanel(error_rate=1.0)
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond),
+                    circuit_breaker=CircuitBreaker(threshold=3))
+    for _ in range(3):
+        assert dash.request('GET', '/api')['status'] == 'failed'
+    
+    try:
+        dash.request('GET', '/api')
+    except CircuitOpenError:
+        pass
+    else:
+        raise AssertionError('an open circuit must refuse requests')
+    
+    assert panel.requests == 3
+
+
+def test_cancelled_trial_does_not_lock_the_breaker():
+    panel = FakePanel()
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.02)
+    
+    async def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        await asyncio.sleep(1)
+        return panel.respond(method, path, body, headers)
+    
+    async def run():
+        dash = AsyncDashactyl('http://panel', 'key', transport=AsyncLocalTransport(respond),
+                            circuit_breaker=breaker)
+        breaker.failure()
+        await asyncio.sleep(0.03)
+        trial = asyncio.ensure_future(dash.request('GET', '/api'))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow()
+        trial.cancel()
+        try:
+            await trial
+        except asyncio.CancelledError:
+            pass
+    
+    asyncio.run(run())
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
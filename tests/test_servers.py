@@ -0,0 +1,67 @@
+# Registry, totals and quota bookkeeping of servers
+import gc
+from dashactylpy import CachePolicy, Dashactyl, DashUser, LocalTransport
+from fakepanel import FakePanel, snowflake
+
+
+def client(panel: FakePanel, **options) -> Dashactyl:
+    return Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond), **options)
+
+
+def test_removed_users_take_their_servers():
+    panel = FakePanel(servers=2)
+    dash = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    dash.users.fetch(snowflake(2))
+    assert len(dash.servers.owned_by(1)) == 2
+    dash.users.remove(user)
+    assert dash.servers.owned_by(1) == []
+    assert 1 not in dash.servers.totals('user')
+    assert dash.servers.usage(1)['servers'] == 0
+    assert len(dash.servers.owned_by(2)) == 2
+
+
+def test_refetched_users_keep_only_current_servers():
+    panel = FakePanel(servers=2)
+    dash = client(panel)
+    dash.users.fetch(snowflake(1))
+    del panel.users[1]['userinfo']['attributes']['relationships']['servers']['data'][1]
+    user = dash.users.fetch(snowflake(1))
+    assert dash.servers.owned_by(1) == list(user._servers)
+    assert dash.servers.totals('user')[1]['servers'] == 1
+
+
+def test_evicted_users_are_released():
+    panel = FakePanel()
+    dash = client(panel)
+    dash.users.cache.policy = CachePolicy(max_size=5)
+    for i in range(200):
+        dash.users.fetch(snowflake(i))
+    
+    gc.collect()
+    assert sum(isinstance(o, DashUser) and o.client is dash for o in gc.get_objects()) == 5
+    assert len(dash.servers.cache) == 5
+    assert sorted(dash.servers.totals('user')) == list(range(195, 200))
+
+
+def test_modify_sends_only_the_given_specs():
+    panel = FakePanel()
+    dash = client(panel)
+    user = dash.users.fetch(snowflake(1))
+    server = user.servers.find(lambda s: True)
+    assert server.modify(ram=512) is server
+    assert (server.limits['memory'], server.limits['disk'], server.limits['cpu']) == (512, 5120, 100)
+    assert panel._servers(1)[0]['attributes']['limits']['disk'] == 5120
+    assert panel._servers(1)[0]['attributes']['limits']['memory'] == 512
+    assert dash.servers.totals('user')[1]['ram'] == 512
+    assert user.resources.remaining()['ram'] == 2048 - 512
+
+
+def test_remaining_ignores_registry_eviction():
+    panel = FakePanel(servers=2)
+    dash = client(panel)
+    dash.servers.cache.policy = CachePolicy(max_size=1)
+    user = dash.users.fetch(snowflake(1))
+    assert len(dash.servers.cache) == 1
+    assert user.resources.used() == {'ram': 2048, 'disk': 10240, 'cpu': 200, 'servers': 2}
+    assert user.resources.remaining() == {'ram': 0, 'disk': 0, 'cpu': -50, 'servers': 0}
@@ -0,0 +1,69 @@
+# Incremental parsing of streamed array responses
+from json import dumps, loads
+from dashactylpy import Dashactyl, LocalTransport
+from dashactylpy.stream import JSONArrayStream
+from fakepanel import FakePanel
+
+
+def parse(body: bytes, size: int) -> tuple:
+    parser = JSONArrayStream('coupons')
+    items = []
+    for i in range(0, len(body), size):
+        items += parser.feed(body[i:i + size])
+    
+    items += parser.close()
+    return items, parser.fields
+
+
+def test_every_chunk_size():
+    body = dumps({'status': 'success', 'coupons': [{'code': f'code{i}', 'coins': i} for i in range(20)], 'total': 20}).encode()
+    for size in (1, 2, 3, 7, 64, len(body)):
+        items, fields = parse(body, size)
+        assert items == loads(body)['coupons']
+        assert fields == {'status': 'success', 'total': 20}
+
+
+def test_numbers_split_across_chunks():
+    parser = JSONArrayStream('coupons')
+    assert parser.feed(b'{"coupons": [12') == []
+    assert parser.feed(b'34, -5.') == [1234]
+    assert parser.feed(b'5e1]}') == [-55.0]
+    assert parser.close() == []
+
+
+def test_multibyte_characters_split_across_chunks():
+    body = dumps({'coupons': ['café', '🎉']}, ensure_ascii=False).encode()
+    assert parse(body, 1)[0] == ['café', '🎉']
+
+
+def test_empty_array():
+    assert parse(b'{"status": "success", "coupons": []}', 4) == ([], {'status': 'success'})
+
+
+def test_truncated_body_raises():
+    parser = JSONArrayStream('coupons')
+    assert parser.feed(b'{"coupons": [1, 2') == [1]
+    try:
+        parser.close()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('an incomplete body must not parse')
+
+
+def test_malformed_body_raises():
+    for body in (b'[1, 2]', b'{"coupons": {}}', b'{"coupons": [1 2]}', b'{"coupons": []} x'):
+        try:
+            parse(body, 3)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{body!r} must not parse')
+
+
+def test_iter_coupons_matches_fetch():
+    panel = FakePanel(coupons=50)
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(panel.respond))
+    streamed = [(c.code, c.coins) for c in dash.coupons.iter_coupons()]
+    assert streamed == [(c.code, c.coins) for c in dash.coupons.fetch()]
+    assert len(streamed) == 50
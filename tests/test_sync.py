@@ -0,0 +1,82 @@
+# Background polling of cached users and in-place patching of what changed
+from time import monotonic, sleep
+from dashactylpy import Dashactyl, LocalTransport
+from fakepanel import FakePanel, server, snowflake
+
+
+def client(panel: FakePanel, interval: float=60.0) -> tuple:
+    paths = []
+    
+    def respond(method: str, path: str, body: bytes, headers: dict) -> tuple:
+        paths.append(path)
+        return panel.respond(method, path, body, headers)
+    
+    dash = Dashactyl('http://panel', 'key', transport=LocalTransport(respond),
+                    sync_users=True, sync_budget=100, sync_interval=interval)
+    events = []
+    dash.sync.on_change.append(lambda user, field, old, new: events.append((user, field, old, new)))
+    return dash, paths, events
+
+
+def test_users_are_polled_by_discord_id():
+    panel = FakePanel()
+    dash, paths, events = client(panel)
+    user = dash.users.fetch(snowflake(3))
+    paths.clear()
+    dash.sync.sync(user)
+    assert paths == [f'/api/userinfo/{snowflake(3)}']
+    assert events == []
+    assert dash.sync.stats()['failures'] == 0
+
+
+def test_changes_are_patched_in_place():
+    panel = FakePanel()
+    dash, _, events = client(panel)
+    user = dash.users.fetch(snowflake(3))
+    coins, resources, first = user.coins, user.resources, user.servers.find(lambda s: True)
+    
+    data = panel.users[3]
+    data['coins'] = 150
+    data['extra']['ram'] = 1024
+    servers = data['userinfo']['attributes']['relationships']['servers']['data']
+    servers[0]['attributes']['limits']['memory'] = 512
+    servers.append(server(31, 3))
+    dash.sync.sync(user)
+    
+    changed = {field: (old, new) for u, field, old, new in events if u is user}
+    assert changed['coins'] == (100, 150)
+    assert changed['resources'][1]['ram'] == 3072
+    removed, updated = changed['servers']
+    assert removed == []
+    assert updated[0] is first
+    assert [s.id for s in updated] == [30, 31]
+    
+    assert user.coins is coins and coins.amount == 150
+    assert user.resources is resources and resources.ram == 3072
+    assert first.limits['memory'] == 512
+    assert dash.servers.get(first.uuid) is first
+    assert dash.servers.usage(3)['ram'] == 512 + 1024
+    assert dash.users.get(snowflake(3)) is user
+
+
+def test_cached_users_are_polled_in_the_background():
+    panel = FakePanel()
+    dash, _, events = client(panel, interval=0.02)
+    user = dash.users.fetch(snowflake(3))
+    panel.users[3]['coins'] = 175
+    deadline = monotonic() + 2
+    while not events and monotonic() < deadline:
+        sleep(0.01)
+    
+    dash.close()
+    assert events[0] == (user, 'coins', 100, 175)
+    assert user.coins.amount == 175
+
+
+def test_removed_users_are_unscheduled():
+    panel = FakePanel()
+    dash, _, _ = client(panel)
+    user = dash.users.fetch(snowflake(3))
+    assert dash.sync.stats()['scheduled'] == 1
+    dash.users.remove(user)
+    assert dash.sync.stats()['scheduled'] == 0